@@ -244,7 +244,7 @@ def search_data(data, search_params, data_type='planning', limit=1000):
     
     Args:
         data: Data to search in
-        search_params: Dictionary of search parameters
+        search_params: Mapping of search parameters, request.args can be passed as is
         data_type: Type of data ('realtime' or 'planning')
         limit: Maximum number of results to return
         
@@ -263,13 +263,18 @@ def search_data(data, search_params, data_type='planning', limit=1000):
     
     exact = search_params.get('exact', '').lower() == 'true'
     
+    try:
+        limit = int(search_params.get('limit', limit))
+    except (TypeError, ValueError):
+        pass
+    
     return search_engine.execute_search(
         data=data,
         search_field=search_field,
         search_value=search_value,
         data_type=data_type,
         exact=exact,
-        limit=int(search_params.get('limit', limit))
+        limit=limit
     )
 
 def optimize_data_for_search(data, fields=None):
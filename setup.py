@@ -33,9 +33,14 @@ setup(
         "schedule>=1.1.0",
         "flask>=2.0.0",
         "flask-cors>=3.0.10",
+        "waitress>=2.1.2",  # Production WSGI server
         "lxml>=4.9.0",  # For better HTML parsing with BeautifulSoup
         "charset-normalizer",  # For better character encoding detection
         "pandas>=1.3.0",    # For parsing CSV and TXT files
+        "orjson>=3.8.0",  # Fast JSON serialization for large responses
+        "Flask-Limiter[redis]>=3.5.0",  # Rate limiting, optionally shared through Redis
+        "msgspec>=0.18.0",  # For validating query parameters
+        "jsonschema-rs>=0.20.0",  # For validating JSON request bodies
     ],
     entry_points={
         "console_scripts": [
@@ -4,6 +4,20 @@ NMBS Train Data API
 A standalone API for accessing Belgian railways (NMBS/SNCB) real-time train data.
 """
 
-from .api import get_realtime_data, start_data_service, force_update
+from .api import (
+    get_realtime_data,
+    start_data_service,
+    force_update,
+    get_planning_files_list,
+    get_planning_file,
+    get_planning_file_rows
+)
 
-__all__ = ['get_realtime_data', 'start_data_service', 'force_update']
\ No newline at end of file
+__all__ = [
+    'get_realtime_data',
+    'start_data_service',
+    'force_update',
+    'get_planning_files_list',
+    'get_planning_file',
+    'get_planning_file_rows'
+]
@@ -1,9 +1,11 @@
 import os
 import json
+import threading
 from .data_service import NMBSDataService
 
 # Singleton instance of the data service
 _data_service = None
+_data_service_lock = threading.Lock()
 
 def get_data_service():
     """
@@ -11,7 +13,9 @@ def get_data_service():
     """
     global _data_service
     if _data_service is None:
-        _data_service = NMBSDataService()
+        with _data_service_lock:
+            if _data_service is None:
+                _data_service = NMBSDataService()
     return _data_service
 
 def start_data_service():
@@ -27,7 +31,9 @@ def start_data_service():
         threading.Thread: The background thread running the service
     """
     service = get_data_service()
-    return service.start_background_service()
+    # Only one background service per process, also when called from several threads
+    with _data_service_lock:
+        return service.start_background_service()
 
 def get_realtime_data():
     """
@@ -71,6 +77,19 @@ def get_planning_file(filename, page=0, page_size=1000, search_params=None):
     # Call the enhanced get_planning_data_file method with all parameters
     return service.get_planning_data_file(filename, page, page_size, search_params)
 
+def get_planning_file_rows(filename):
+    """
+    Get all rows of a planning file, for callers that keep the whole file in memory
+    
+    Args:
+        filename (str): Name of the CSV/TXT file to get
+    
+    Returns:
+        list: The rows as dictionaries, or None if the file has no rows
+    """
+    service = get_data_service()
+    return service.get_planning_data_rows(filename)
+
 def force_update():
     """
     Force an immediate update of the data
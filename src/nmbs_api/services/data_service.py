@@ -84,6 +84,18 @@ class DataService(BaseService):
         """
         return self.parser.get_planning_data_file(filename, page, page_size, search_params)
     
+    def get_planning_data_rows(self, filename):
+        """
+        Get all rows of a planning data file, without pagination
+        
+        Args:
+            filename: The name of the CSV/TXT file to get
+            
+        Returns:
+            list: The rows of the file as dictionaries, or None if the file has no rows
+        """
+        return self.parser.get_planning_data_rows(filename)
+    
     def run_as_service(self):
         """
         Run the data service with scheduled tasks
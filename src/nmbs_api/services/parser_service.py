@@ -116,6 +116,11 @@ class ParserService(BaseService):
             str: The file content as string (for other files)
             dict: A paginated response with metadata if pagination is used
         """
+        # Only plain file names, never a path out of the planning data folder
+        if os.path.basename(filename) != filename or filename in ('', '.', '..'):
+            logger.warning(f"Ongeldige planning bestandsnaam: {filename}")
+            return None
+        
         file_path = os.path.join(self.planning_extracted_dir, filename)
         
         if not os.path.exists(file_path):
@@ -156,6 +161,38 @@ class ParserService(BaseService):
             logger.error(traceback.format_exc())
             return None
     
+    def get_planning_data_rows(self, filename):
+        """
+        Get all rows of a planning data file, without pagination
+        
+        Args:
+            filename: The name of the CSV/TXT file to get
+            
+        Returns:
+            list: The rows of the file as dictionaries, or None if the file has no rows
+        """
+        # Only plain file names, never a path out of the planning data folder
+        if os.path.basename(filename) != filename or filename in ('', '.', '..'):
+            logger.warning(f"Ongeldige planning bestandsnaam: {filename}")
+            return None
+        
+        file_path = os.path.join(self.planning_extracted_dir, filename)
+        
+        if not os.path.exists(file_path):
+            logger.warning(f"Planning bestand niet gevonden: {file_path}")
+            return None
+        
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == '.txt':
+            rows = self._parse_txt_file(file_path)
+        elif ext == '.csv':
+            rows = self._parse_csv_file(file_path)
+        else:
+            return None
+        
+        # The TXT parser falls back to the plain text of files that are no table
+        return rows if isinstance(rows, list) else None
+    
     def _parse_small_file_with_advanced_features(self, file_path, page=0, page_size=1000, search_params=None):
         """
         Parse a small CSV/TXT file with advanced features like searching and filtering
@@ -0,0 +1,89 @@
+"""
+Fixtures for the web tests
+
+These tests run against Flask test clients and a small planning data set in a
+temporary folder, so they need neither a running server nor downloaded data.
+They live in their own folder because the test runner in the parent folder
+calls every test_* function of its modules against the live API.
+"""
+import os
+import sys
+import json
+
+import pytest
+
+# The package is imported as src.nmbs_api, like run_web_api.py does. web_api.py
+# in the project root also imports nmbs_api directly.
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+for path in (PROJECT_DIR, os.path.join(PROJECT_DIR, 'src')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+PLANNING_FILES = {
+    'stops.txt': (
+        "stop_id,stop_name,stop_lat,stop_lon\n"
+        + "".join(f"{8800000 + i},Station {i},50.{i:04d},4.{i:04d}\n" for i in range(30))
+    ),
+    'routes.txt': (
+        "route_id,agency_id,route_short_name,route_long_name,route_type\n"
+        + "".join(f"R{i},NMBS,IC,Route {i},2\n" for i in range(5))
+    ),
+    'agency.txt': "agency_id,agency_name\nNMBS,NMBS/SNCB\n",
+}
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    Work in a temporary folder with planning data in the layout the data service uses
+
+    Returns:
+        pathlib.Path: The folder with the extracted planning files
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('ALLOWED_DOMAINS', raising=False)
+    monkeypatch.delenv('TRUSTED_PROXIES', raising=False)
+
+    extracted = tmp_path / 'data' / 'Planning_gegevens' / 'extracted'
+    extracted.mkdir(parents=True)
+    for name, content in PLANNING_FILES.items():
+        (extracted / name).write_text(content, encoding='utf-8')
+    (tmp_path / 'data' / 'Planning_gegevens' / 'planning_updated.json').write_text(json.dumps({
+        'gtfs': {'extracted_files': sorted(PLANNING_FILES)},
+        # Used as generated_at in the metadata, so responses are repeatable
+        'last_downloaded': '2026-01-01T00:00:00'
+    }))
+    (tmp_path / 'data' / 'Real-time_gegevens').mkdir(parents=True)
+
+    # A secret next to the data folder, it must never be served
+    (tmp_path / '.env').write_text("SECRET_KEY=do-not-serve\n")
+
+    _reset_route_caches()
+    yield extracted
+    _reset_route_caches()
+
+def _reset_route_caches():
+    """Forget the planning and realtime responses of earlier tests"""
+    from src.nmbs_api.web import routes
+
+    routes._invalidate_planning_cache()
+    for cached in (routes._cached_planning_file, routes._cached_planning_files,
+                   routes._cached_planning_file_names, routes._planning_endpoint_urls):
+        cached.cache_clear()
+    routes._realtime_snapshot = (None, None)
+
+@pytest.fixture
+def app(data_dir):
+    """The package app, without the background data service and cache thread"""
+    from src.nmbs_api.web.app import create_app
+    from src.nmbs_api.web.security import limiter
+
+    app = create_app(start_services=False)
+    app.config['TESTING'] = True
+    # The limiter and its counters are shared by every app in the process
+    limiter.reset()
+    return app
+
+@pytest.fixture
+def client(app):
+    """Test client of the package app"""
+    return app.test_client()
@@ -0,0 +1,61 @@
+"""
+Tests for the ETags and 304 responses of the planning and cache endpoints
+"""
+import os
+
+def test_planning_pages_answer_revalidation_with_304(client):
+    response = client.get('/api/planningdata/stops?limit=10')
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/api/planningdata/stops?limit=10', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    # Another page of the same file has another ETag
+    other = client.get('/api/planningdata/stops?page=1&limit=10', headers={'If-None-Match': etag})
+    assert other.status_code == 200
+    assert other.headers['ETag'] != etag
+
+def test_planning_etag_changes_with_a_download(client, data_dir):
+    etag = client.get('/api/planningdata/routes').headers['ETag']
+    (data_dir / 'routes.txt').write_text(
+        "route_id,agency_id,route_short_name,route_long_name,route_type\nR9,NMBS,S,Route 9,2\n",
+        encoding='utf-8'
+    )
+    # Every download rewrites planning_updated.json
+    updated = data_dir.parent / 'planning_updated.json'
+    stat = os.stat(updated)
+    os.utime(updated, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    response = client.get('/api/planningdata/routes', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [row["route_id"] for row in response.get_json()["data"]] == ["R9"]
+
+def test_cache_files_answer_revalidation_with_304(client, data_dir):
+    (data_dir.parent.parent / 'stops_cache.json').write_text('[{"stop_id": 1}]')
+    response = client.get('/api/cache/stops')
+    assert response.get_json() == [{"stop_id": 1}]
+
+    revalidated = client.get('/api/cache/stops', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['Cache-Control'] == response.headers['Cache-Control']
+    assert client.get('/api/cache/missing').status_code == 404
+
+def test_combined_cache_is_swapped_in_by_each_update(app, client, data_dir, monkeypatch):
+    cache_manager = app.extensions['cache_manager']
+    monkeypatch.setattr(cache_manager, 'cache_data', {})
+    monkeypatch.setattr(cache_manager, 'cache_blob', None)
+    assert client.get('/api/cache/all').status_code == 404
+
+    assert cache_manager.update_cache()
+    response = client.get('/api/cache/all')
+    assert len(response.get_json()["planning_data"]["stops"]["data"]) == 25
+    etag = response.headers['ETag']
+    assert client.get('/api/cache/all', headers={'If-None-Match': etag}).status_code == 304
+    compressed = client.get('/api/cache/all', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+
+    (data_dir / 'agency.txt').write_text("agency_id,agency_name\nSNCB,SNCB/NMBS\n", encoding='utf-8')
+    assert cache_manager.update_cache()
+    response = client.get('/api/cache/all', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()["planning_data"]["agency"]["data"] == [{"agency_id": "SNCB", "agency_name": "SNCB/NMBS"}]
@@ -0,0 +1,67 @@
+"""
+Tests that pre-serialized responses are laid out like jsonify
+"""
+import json
+
+import pytest
+
+from src.nmbs_api.web import routes
+
+FEED = {"header": {"timestamp": "1700000000"}, "entity": [{"id": "1", "vehicle": {"label": "ë"}}]}
+
+def _as_jsonify(app, response):
+    """Body jsonify gives for the same object, with the key order of the response"""
+    with app.app_context():
+        return app.json.response(json.loads(response.data)).get_data()
+
+@pytest.fixture(params=[False, True], ids=['indented', 'compact'])
+def json_client(request, app):
+    app.json.compact = request.param
+    return app.test_client()
+
+def test_planning_file_is_laid_out_like_jsonify(app, json_client):
+    response = json_client.get('/api/planningdata/stops?limit=3')
+
+    assert response.status_code == 200
+    assert response.data == _as_jsonify(app, response)
+    # Keys in the order of the response object, the metadata comes first
+    assert list(json.loads(response.data)) == ["metadata", "data", "pagination"]
+
+def test_planning_batch_is_laid_out_like_jsonify(app, json_client):
+    for queries in ([{"file": "stops", "limit": 2}, {"file": "missing"}, {"file": "agency"}], []):
+        response = json_client.post('/api/planningdata/batch', json=queries)
+
+        assert response.status_code == 200
+        assert response.data == _as_jsonify(app, response)
+
+def test_realtime_is_laid_out_like_jsonify(app, json_client, data_dir, monkeypatch):
+    (data_dir.parent.parent / 'Real-time_gegevens' / 'last_updated.json').write_text('{}')
+    monkeypatch.setattr(routes, 'get_realtime_data', lambda: FEED)
+
+    response = json_client.get('/api/realtime/data')
+
+    assert response.status_code == 200
+    assert response.data == _as_jsonify(app, response)
+
+def test_health_uses_the_same_layout(app, json_client):
+    response = json_client.get('/api/health')
+    assert response.data == _as_jsonify(app, response)
+
+def test_gzipped_planning_file_has_the_same_body(json_client):
+    import gzip
+
+    plain = json_client.get('/api/planningdata/stops')
+    compressed = json_client.get('/api/planningdata/stops', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+
+def test_trajectories_are_laid_out_like_jsonify(app, json_client, monkeypatch):
+    trajectories = {"metadata": {"page": 0}, "data": [{"trip_id": "T1", "stops": []}]}
+    monkeypatch.setattr(routes, 'get_trajectories', lambda page, page_size: trajectories)
+
+    response = json_client.get('/api/trajectories')
+
+    assert response.status_code == 200
+    assert response.data == _as_jsonify(app, response)
+    assert list(json.loads(response.data)) == ["metadata", "data"]
@@ -0,0 +1,75 @@
+"""
+Tests for the CORS and domain WSGI middleware and the security headers
+"""
+from flask import request
+
+from src.nmbs_api.web.app import create_app
+from src.nmbs_api.web.security import SECURITY_HEADERS
+
+def test_preflight_requests_are_answered_by_the_middleware(client):
+    response = client.options('/api/planningdata/stops', headers={
+        'Origin': 'https://example.org',
+        'Access-Control-Request-Method': 'GET'
+    })
+
+    assert response.status_code == 200
+    assert response.headers['Access-Control-Allow-Origin'] == '*'
+    assert response.headers['Access-Control-Allow-Methods'] == 'GET, POST, OPTIONS'
+    assert response.data == b""
+    # Answered before Flask, so the security headers are not added
+    assert 'X-Content-Type-Options' not in response.headers
+
+def test_cross_origin_requests_get_the_allow_origin_header(client):
+    response = client.get('/api/health', headers={'Origin': 'https://example.org'})
+
+    assert response.status_code == 200
+    assert response.headers.getlist('Access-Control-Allow-Origin') == ['*']
+    assert 'Access-Control-Allow-Origin' not in client.get('/api/health').headers
+
+def test_requests_for_other_hosts_are_rejected(data_dir, monkeypatch):
+    monkeypatch.setenv('ALLOWED_DOMAINS', 'nmbsapi.example.org, localhost')
+    client = create_app(start_services=False).test_client()
+
+    assert client.get('/api/health', base_url='http://localhost:25580').status_code == 200
+    response = client.get('/api/health', base_url='http://other.example.org')
+    assert response.status_code == 403
+    assert response.get_json()["error"] == "Access denied"
+
+def test_forwarded_host_is_ignored_without_a_trusted_proxy(data_dir, monkeypatch):
+    monkeypatch.setenv('ALLOWED_DOMAINS', 'nmbsapi.example.org')
+    monkeypatch.setenv('TRUSTED_PROXIES', '0')
+    client = create_app(start_services=False).test_client()
+
+    response = client.get('/api/health', base_url='http://203.0.113.5',
+                          headers={'X-Forwarded-Host': 'nmbsapi.example.org'})
+    assert response.status_code == 403
+
+def test_forwarded_headers_of_one_proxy_are_trusted_by_default(data_dir, monkeypatch):
+    monkeypatch.setenv('ALLOWED_DOMAINS', 'nmbsapi.example.org')
+    app = create_app(start_services=False)
+
+    @app.route('/client')
+    def client_address():
+        return request.remote_addr
+
+    response = app.test_client().get('/client', base_url='http://10.0.0.2', headers={
+        'X-Forwarded-Host': 'nmbsapi.example.org',
+        'X-Forwarded-For': '198.51.100.7'
+    })
+    assert response.status_code == 200
+    assert response.data == b'198.51.100.7'
+
+def test_security_headers_are_added_to_every_response(client):
+    response = client.get('/api/health')
+
+    for header, value in SECURITY_HEADERS.items():
+        assert response.headers[header] == value
+
+def test_cacheable_responses_keep_their_cache_control(client, data_dir):
+    (data_dir.parent.parent / 'stops_cache.json').write_text('[{"stop_id": 1}]')
+    response = client.get('/api/cache/stops')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'].startswith('public')
+    assert 'Pragma' not in response.headers
+    assert response.headers['X-Content-Type-Options'] == SECURITY_HEADERS['X-Content-Type-Options']
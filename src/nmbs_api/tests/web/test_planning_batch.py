@@ -0,0 +1,95 @@
+"""
+Tests for the planning data batch endpoint
+"""
+from src.nmbs_api.web import routes
+
+def test_batch_answers_each_query_in_order(client):
+    response = client.post('/api/planningdata/batch', json=[
+        {"file": "stops", "limit": 10},
+        {"file": "routes.txt"},
+        {"file": "missing"}
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert len(results) == 3
+    assert len(results[0]["data"]) == 10
+    assert results[0]["pagination"]["totalRecords"] == 30
+    assert len(results[1]["data"]) == 5
+    assert results[2] == {"error": "Planning file 'missing' not found"}
+
+def test_batch_rejects_invalid_bodies(client):
+    assert client.post('/api/planningdata/batch', json={"file": "stops"}).status_code == 400
+    assert client.post('/api/planningdata/batch', json=[{"limit": 10}]).status_code == 400
+    assert client.post('/api/planningdata/batch', json=[{"file": "stops"}] * 11).status_code == 400
+
+def test_batch_does_not_read_files_outside_the_planning_data(client):
+    names = [
+        "../../../../../../../../etc/passwd",
+        "../../.env",
+        "/etc/passwd",
+        "..\\..\\.env",
+        "calendar.txt",
+        "planning_updated.json",
+    ]
+    response = client.post('/api/planningdata/batch', json=[{"file": name} for name in names])
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert results == [{"error": f"Planning file '{name}' not found"} for name in names]
+    assert b"root:" not in response.data
+    assert b"do-not-serve" not in response.data
+
+def test_single_file_endpoint_rejects_unknown_names(client):
+    assert client.get('/api/planningdata/stops.txt').status_code == 200
+    assert client.get('/api/planningdata/planning_updated.json').status_code == 404
+    assert client.get('/api/planningdata/..%2F..%2F.env').status_code == 404
+
+def test_batch_queries_are_validated_like_the_query_string(client):
+    assert client.get('/api/planningdata/stops?station_id=<script>').status_code == 400
+    assert client.get('/api/planningdata/stops?page_size=5000').status_code == 400
+
+    response = client.post('/api/planningdata/batch', json=[
+        {"file": "stops", "station_id": "<script>"},
+        {"file": "stops", "page_size": 5000},
+        {"file": "stops", "page": "-1"},
+        {"file": "stops", "limit": 2}
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result.get("params") for result in results[:3]] == [["station_id"], ["page_size"], ["page"]]
+    assert all(result["error"] == "Invalid query parameters" for result in results[:3])
+    assert b"<script>" not in response.data
+    assert len(results[3]["data"]) == 2
+
+def test_batch_rejects_values_without_a_query_string_form(client):
+    response = client.post('/api/planningdata/batch', json=[
+        {"file": "stops", "search": True},
+        {"file": "stops", "stop_name": None},
+        {"file": "stops", "search": ["stop_name"], "limit": {"max": 1}},
+        {"file": "stops", "limit": 3, "page": 1}
+    ])
+
+    results = response.get_json()["results"]
+    assert [result.get("params") for result in results[:3]] == [["search"], ["stop_name"], ["limit", "search"]]
+    assert [row["stop_id"] for row in results[3]["data"]] == [8800003, 8800004, 8800005]
+
+def test_batch_rows_are_limited_over_all_queries(client):
+    response = client.post('/api/planningdata/batch', json=[{"file": "stops", "limit": 5000}, {"file": "routes", "limit": 1}])
+    assert response.status_code == 400
+    assert "5000 rows" in response.get_json()["message"]
+
+    # Queries for unknown files and invalid queries read no rows
+    response = client.post('/api/planningdata/batch', json=[{"file": "stops", "limit": 5000}, {"file": "missing"}])
+    assert response.status_code == 200
+
+def test_batch_errors_do_not_expose_the_exception(client, monkeypatch):
+    def failing(*args, **kwargs):
+        raise OSError("/srv/nmbs/data/Planning_gegevens/stops.txt is not readable")
+    monkeypatch.setattr(routes, '_planning_file', failing)
+
+    response = client.post('/api/planningdata/batch', json=[{"file": "stops"}])
+    assert response.status_code == 500
+    assert response.get_json()["message"] == routes.INTERNAL_ERROR_MESSAGE
+    assert b"Planning_gegevens" not in response.data
@@ -0,0 +1,124 @@
+"""
+Tests for the sliding window, token bucket and concurrent request limits
+"""
+import threading
+
+import fakeredis
+import pytest
+from flask import Flask
+
+from src.nmbs_api.web import rate_limits
+
+@pytest.fixture
+def redis_limiter(monkeypatch):
+    """A sliding window limiter on an in-memory Redis, used by the decorators created in the test"""
+    sliding = rate_limits.SlidingWindowLimiter('redis://localhost:6379/0')
+    sliding.client = fakeredis.FakeRedis()
+    monkeypatch.setattr(rate_limits, '_sliding_window_limiter', sliding)
+    return sliding
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Time as seen by the limiters, moved forward by the tests"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limits.time, 'time', lambda: now[0])
+    monkeypatch.setattr(rate_limits.time, 'monotonic', lambda: now[0])
+    return now
+
+def _app_with(decorator):
+    app = Flask(__name__)
+
+    @app.route('/limited')
+    @decorator
+    def limited():
+        return 'ok'
+    return app.test_client()
+
+def test_token_bucket_allows_a_burst_and_refills(clock):
+    client = _app_with(rate_limits.token_bucket_limit("2 per minute"))
+
+    assert [client.get('/limited').status_code for _ in range(3)] == [200, 200, 429]
+    # One token comes back every 30 seconds
+    clock[0] += 30
+    assert [client.get('/limited').status_code for _ in range(2)] == [200, 429]
+
+def test_token_bucket_keeps_a_bounded_number_of_clients(clock):
+    bucket_limiter = rate_limits.TokenBucketLimiter(1, 1, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        assert bucket_limiter.hit(key)
+
+    assert list(bucket_limiter.buckets) == ['b', 'c']
+    assert not bucket_limiter.hit('c')
+
+def test_sliding_window_allows_limit_requests_per_window(redis_limiter, clock):
+    client = _app_with(rate_limits.sliding_window_limit("2 per minute"))
+
+    assert [client.get('/limited').status_code for _ in range(3)] == [200, 200, 429]
+    clock[0] += 59
+    assert client.get('/limited').status_code == 429
+    # The first requests left the window
+    clock[0] += 2
+    assert client.get('/limited').status_code == 200
+
+def test_sliding_window_loads_the_script_again_after_a_flush(redis_limiter, clock):
+    assert redis_limiter.hit('key', 1, 60_000)
+    redis_limiter.client.script_flush()
+
+    assert not redis_limiter.hit('key', 1, 60_000)
+
+def test_sliding_window_lets_requests_through_when_redis_fails(redis_limiter, monkeypatch):
+    client = _app_with(rate_limits.sliding_window_limit("1 per minute"))
+
+    def unreachable(*args):
+        raise ConnectionError("Redis is down")
+    monkeypatch.setattr(redis_limiter, 'hit', unreachable)
+    assert [client.get('/limited').status_code for _ in range(2)] == [200, 200]
+
+def _blocking_app(max_active):
+    app = Flask(__name__)
+    started = threading.Semaphore(0)
+    finish = threading.Event()
+
+    @app.route('/slow')
+    @rate_limits.concurrent_limit(max_active)
+    def slow():
+        started.release()
+        finish.wait(5)
+        return 'ok'
+    return app, started, finish
+
+def _concurrent_statuses(app, started, finish, in_progress):
+    """Start in_progress slow requests, then send one more while they run"""
+    statuses = []
+    threads = [threading.Thread(target=lambda: statuses.append(app.test_client().get('/slow').status_code))
+               for _ in range(in_progress)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        assert started.acquire(timeout=5)
+    extra = app.test_client().get('/slow').status_code
+    finish.set()
+    for thread in threads:
+        thread.join()
+    return statuses, extra
+
+def test_concurrent_limit_rejects_requests_beyond_the_limit(monkeypatch):
+    monkeypatch.setattr(rate_limits, '_sliding_window_limiter', None)
+    app, started, finish = _blocking_app(2)
+
+    statuses, extra = _concurrent_statuses(app, started, finish, 2)
+
+    assert statuses == [200, 200]
+    assert extra == 429
+    # The finished requests released their slots
+    assert app.test_client().get('/slow').status_code == 200
+
+def test_concurrent_limit_is_shared_through_redis(redis_limiter):
+    app, started, finish = _blocking_app(1)
+
+    statuses, extra = _concurrent_statuses(app, started, finish, 1)
+
+    assert statuses == [200]
+    assert extra == 429
+    # The finished request removed itself from the sorted set
+    assert redis_limiter.client.keys('nmbs_api:concurrent:*') == []
@@ -0,0 +1,37 @@
+"""
+Tests for the realtime data endpoint
+"""
+import json
+
+from src.nmbs_api.web import routes
+
+FEED = {"header": {"timestamp": "1700000000"}, "entity": [{"id": "1"}, {"id": "2"}]}
+
+def _write_last_updated(data_dir):
+    path = data_dir.parent.parent / 'Real-time_gegevens' / 'last_updated.json'
+    path.write_text(json.dumps({"realtime": {"last_downloaded": "2026-01-01T00:00:00"}}))
+
+def test_realtime_is_served_with_an_etag(client, data_dir, monkeypatch):
+    _write_last_updated(data_dir)
+    monkeypatch.setattr(routes, 'get_realtime_data', lambda: FEED)
+
+    response = client.get('/api/realtime/data')
+    assert response.status_code == 200
+    assert response.get_json()["metadata"]["total_records"] == 2
+    assert response.headers['ETag']
+
+    cached = client.get('/api/realtime/data', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+def test_failed_read_is_retried_on_the_next_request(client, data_dir, monkeypatch):
+    _write_last_updated(data_dir)
+    feeds = [None, FEED]
+    monkeypatch.setattr(routes, 'get_realtime_data', lambda: feeds.pop(0))
+
+    assert client.get('/api/realtime/data').status_code == 404
+
+    # Same download, the snapshot is built again instead of serving the failure
+    response = client.get('/api/realtime/data')
+    assert response.status_code == 200
+    assert [entity["id"] for entity in response.get_json()["entity"]] == ["1", "2"]
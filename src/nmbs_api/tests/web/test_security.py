@@ -0,0 +1,28 @@
+"""
+Tests for the request parameter validation and security headers
+"""
+from src.nmbs_api.web import security
+
+def test_invalid_parameters_of_api_endpoints_are_rejected(client):
+    assert client.get('/api/planningdata/stops?page=abc').status_code == 400
+    assert client.get('/api/planningdata/stops?station_id=<script>').status_code == 400
+    assert client.get('/api/planningdata/stops?page=1&limit=5').status_code == 200
+
+def test_endpoints_outside_the_api_blueprint_skip_validation(app, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(security, 'log_security_event', lambda *args: calls.append(args))
+
+    @app.route('/outside')
+    def outside():
+        return 'ok'
+
+    assert client.get('/outside?page=abc').status_code == 200
+    assert not [call for call in calls if call[0] == 'input_validation_failure']
+
+def test_sanitized_args_outside_the_api_blueprint_are_the_raw_arguments(app):
+    with app.test_request_context('/outside?search=%20Gent%20'):
+        assert security.get_sanitized_args() == {'search': ' Gent '}
+
+    with app.test_request_context('/api/planningdata/stops?search=%20Gent%20'):
+        security.validate_input()
+        assert security.get_sanitized_args() == {'search': 'Gent'}
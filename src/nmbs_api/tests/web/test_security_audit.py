@@ -0,0 +1,40 @@
+"""
+Tests for the background security audit writer
+"""
+import queue
+
+from src.nmbs_api.web import security
+
+class FailingLog:
+    """Log file whose first write fails"""
+
+    def __init__(self, opened):
+        self.closed = False
+        self.lines = []
+        opened.append(self)
+
+    def write(self, line):
+        if not self.lines:
+            self.lines.append(None)
+            raise OSError("disk full")
+        self.lines.append(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def test_writer_closes_the_file_after_a_write_error(monkeypatch):
+    opened = []
+    monkeypatch.setattr(security, 'open', lambda *args, **kwargs: FailingLog(opened), raising=False)
+    monkeypatch.setattr(security, '_audit_queue', queue.Queue())
+
+    security._audit_queue.put(('2026-01-01', 'first\n'))
+    security._audit_queue.put(('2026-01-01', 'second\n'))
+    security._audit_queue.put((None, security._AUDIT_STOP))
+    security._audit_writer_loop()
+
+    # Every failed file is closed and the next entry goes to a new one
+    assert len(opened) == 2
+    assert all(log.closed for log in opened)
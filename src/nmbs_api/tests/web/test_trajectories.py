@@ -0,0 +1,85 @@
+"""
+Tests for the trajectories builder and its file cache
+"""
+import os
+import json
+
+from src.nmbs_api.web import trajectories_endpoint as trajectories
+
+def test_rewritten_file_replaces_its_cached_version(tmp_path):
+    path = tmp_path / 'realtime.json'
+    path.write_text(json.dumps({"version": 1}))
+    first = trajectories._load_json_file(path)
+
+    # Unchanged files are not parsed again
+    assert trajectories._load_json_file(path) is first
+
+    path.write_text(json.dumps({"version": 22}))
+    os.utime(path, ns=(1, 1))
+    assert trajectories._load_json_file(path) == {"version": 22}
+
+    # Only the latest version is kept
+    cached = [key for key in trajectories._parsed_files if key == str(path)]
+    assert len(cached) == 1
+    assert trajectories._parsed_files[str(path)][2] == {"version": 22}
+
+REALTIME = {
+    "entity": [
+        {"id": "1", "tripUpdate": {"trip": {"tripId": "T1"}, "stopTimeUpdate": [
+            {"stopId": "8800001_3", "arrival": {"time": "1700000000", "delay": 120}},
+            {"stopId": "8800002", "departure": {"time": "1700000600", "delay": -60}},
+            {"stopId": "9999999", "departure": {"time": "1700000900", "delay": 7200}},
+        ]}},
+        {"id": "2", "tripUpdate": {"trip": {"tripId": "T2"}, "stopTimeUpdate": [{"arrival": {"time": "1"}}]}},
+    ]
+}
+STOPS = [{"stop_id": "8800001", "stop_name": "Brussel", "stop_lat": 50.8, "stop_lon": 4.3},
+         {"stop_id": "8800002", "stop_name": "Mechelen", "stop_lat": 51.0, "stop_lon": 4.5}]
+TRIPS = [{"trip_id": "T1", "route_id": "R1", "trip_short_name": "IC 1", "trip_headsign": "Antwerpen", "service_id": "S"}]
+ROUTES = [{"route_id": "R1", "route_short_name": "IC", "route_long_name": "Brussel - Antwerpen", "agency_id": "NMBS"}]
+TRANSLATIONS = [{"table_name": "stops", "field_name": "stop_name", "field_value": "Brussel",
+                 "language": "fr", "translation": "Bruxelles"}]
+
+def test_build_trajectories_formats_every_stop():
+    result = trajectories._build_trajectories(REALTIME, STOPS, TRIPS, ROUTES, TRANSLATIONS)
+
+    # Entities without stop ids are skipped
+    assert [t["entity_id"] for t in result] == ["1"]
+    trajectory = result[0]
+    assert trajectory["route"]["route_name"] == "Brussel - Antwerpen"
+    assert trajectory["trip"]["trip_number"] == "IC 1"
+
+    first, second, unknown = trajectory["stops"]
+    assert first["station"]["name"] == "Brussel"
+    assert first["station"]["translations"] == {"fr": "Bruxelles"}
+    assert first["arrival"]["delay_minutes"] == 2
+    assert first["arrival"]["status"] == "delayed by 2 min"
+    assert first["departure"] is None
+    assert second["departure"]["status"] == "early by 1 min"
+    assert unknown["station"]["name"] == "Unknown Station"
+    assert unknown["departure"]["status"] == "delayed by 120 min"
+
+    # The cached and the per-page builder use the same formatter
+    lookups = trajectories._build_lookups(STOPS, TRIPS, ROUTES, TRANSLATIONS)
+    assert trajectories._build_trajectory(REALTIME["entity"][0], lookups) == trajectory
+
+def test_column_wise_build_equals_the_per_entity_build():
+    delays = [0, 59, 60, -61, 125, "180", 7200, -900]
+    realtime = {"entity": [
+        {"id": str(i), "tripUpdate": {"trip": {"tripId": "T1" if i % 2 else f"X{i}"}, "stopTimeUpdate": [
+            {
+                "stopId": f"880000{j % 3}_{j % 2}" if j % 4 else "9999999",
+                "arrival": {"time": str(1700000000 + 60 * ((i + j) % 5)), "delay": delays[(i + j) % len(delays)]},
+                **({"departure": {"delay": 60}} if j % 3 == 0 else
+                   {"departure": {"time": str(1700000300 + 60 * j), "delay": delays[j % len(delays)]}})
+            }
+            for j in range(6)
+        ]}}
+        for i in range(8)
+    ]}
+
+    result = trajectories._build_trajectories(realtime, STOPS, TRIPS, ROUTES, TRANSLATIONS)
+
+    lookups = trajectories._build_lookups(STOPS, TRIPS, ROUTES, TRANSLATIONS)
+    assert result == [trajectories._build_trajectory(entity, lookups) for entity in realtime["entity"]]
+    assert trajectories._build_trajectories({"entity": []}, STOPS, TRIPS, ROUTES, TRANSLATIONS) == []
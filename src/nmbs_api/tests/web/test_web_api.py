@@ -0,0 +1,182 @@
+"""
+Tests for the planning data cache of web_api.py
+"""
+import os
+import sys
+import gzip
+import threading
+
+import orjson
+import pytest
+
+@pytest.fixture
+def web_api(data_dir, tmp_path, monkeypatch):
+    """web_api with its cache built from the test planning data"""
+    import web_api
+
+    # The warm-up started on import must not replace the cache built here
+    for thread in threading.enumerate():
+        if thread.name == 'cache-warmer':
+            thread.join()
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    monkeypatch.setattr(web_api, 'CACHE_DIR', str(cache_dir))
+    web_api.init_cache()
+    web_api.app.config['TESTING'] = True
+    web_api.limiter.reset()
+    return web_api
+
+@pytest.fixture
+def client(web_api):
+    return web_api.app.test_client()
+
+def _ndjson_rows(body):
+    return [orjson.loads(line) for line in body.splitlines()]
+
+def test_init_cache_loads_every_row_of_the_common_files(web_api):
+    assert len(web_api.data_cache['stops.txt']) == 30
+    assert len(web_api.data_cache['routes.txt']) == 5
+    assert ('stops.txt', 0, 1000) in web_api.cache_bytes
+    assert ('routes.txt', 0, 5000) in web_api.cache_bytes
+
+def test_cached_pages_are_served_from_the_cache(client, web_api):
+    response = client.get('/api/planningdata/stops?limit=1000')
+
+    assert response.status_code == 200
+    assert response.data == web_api.cache_bytes[('stops.txt', 0, 1000)]
+    body = response.get_json()
+    assert len(body["data"]) == 30
+    assert body["pagination"]["totalRecords"] == 30
+
+def test_other_page_sizes_are_paginated_from_the_rows(client):
+    body = client.get('/api/planningdata/stops?page=2&limit=10').get_json()
+
+    assert [row["stop_id"] for row in body["data"]] == list(range(8800020, 8800030))
+    assert body["pagination"]["hasNextPage"] is False
+    assert body["pagination"]["hasPrevPage"] is True
+
+def test_files_that_are_not_cached_are_paginated_by_the_parser(client, web_api):
+    body = client.get('/api/planningdata/agency').get_json()
+
+    assert body["data"] == [{"agency_id": "NMBS", "agency_name": "NMBS/SNCB"}]
+    assert body["pagination"]["totalRecords"] == 1
+    assert ('agency.txt', 0, 1000) in web_api.page_cache
+    assert client.get('/api/planningdata/trips').status_code == 404
+
+def test_pages_cached_on_request_are_bounded(client, web_api, monkeypatch):
+    monkeypatch.setattr(web_api, 'PAGE_CACHE_SIZE', 2)
+    client.get('/api/planningdata/agency?limit=1000')
+    client.get('/api/planningdata/agency?limit=5000')
+    # A hit makes the page the most recently used one
+    client.get('/api/planningdata/agency?limit=1000')
+    client.get('/api/planningdata/stops?page=99&limit=1000')
+    client.get('/api/planningdata/stops?limit=10')
+    assert list(web_api.page_cache) == [('agency.txt', 0, 5000), ('agency.txt', 0, 1000)]
+
+    web_api.cache_bytes.pop(('routes.txt', 0, 1000))
+    client.get('/api/planningdata/routes?limit=1000')
+    assert list(web_api.page_cache) == [('agency.txt', 0, 1000), ('routes.txt', 0, 1000)]
+
+def test_search_runs_over_every_row(client):
+    body = client.get('/api/planningdata/stops?search=Station 29').get_json()
+
+    assert 8800029 in [row["stop_id"] for row in body["data"]]
+
+def test_cursor_pages_follow_the_last_id(client):
+    first = client.get('/api/planningdata/stops?cursor=&limit=12').get_json()
+    second = client.get(f'/api/planningdata/stops?cursor={first["next_cursor"]}&limit=12').get_json()
+
+    assert [row["stop_id"] for row in first["data"]] == list(range(8800000, 8800012))
+    assert [row["stop_id"] for row in second["data"]] == list(range(8800012, 8800024))
+    assert client.get('/api/planningdata/stops?cursor=unknown').status_code == 400
+
+def test_ndjson_pages_are_sliced_from_the_mapped_rows(client, web_api):
+    assert 'stops.txt' in web_api.ndjson_maps
+    response = client.get('/api/planningdata/stops?format=ndjson&page=1&limit=10')
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Total-Count'] == '30'
+    assert [row["stop_id"] for row in _ndjson_rows(response.data)] == list(range(8800010, 8800020))
+
+    response = client.get('/api/planningdata/stops?format=ndjson&cursor=8800027')
+    assert [row["stop_id"] for row in _ndjson_rows(response.data)] == [8800028, 8800029]
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_ndjson_files_are_written_without_shared_temporary_files(web_api, tmp_path):
+    rows = [{"stop_id": i} for i in range(3)]
+    first = web_api._write_ndjson('stops.txt', rows)
+    second = web_api._write_ndjson('stops.txt', rows[:1])
+
+    # Maps of the replaced files stay valid, and no temporary files are left
+    assert _ndjson_rows(web_api._ndjson_slice(first, 0, 3)) == rows
+    assert _ndjson_rows(web_api._ndjson_slice(second, 0, 3)) == rows[:1]
+    assert sorted(os.listdir(tmp_path / 'cache')) == ['routes.txt.idx', 'routes.txt.ndjson',
+                                                      'stops.txt.idx', 'stops.txt.ndjson']
+
+def test_ndjson_of_files_that_are_not_cached(client):
+    response = client.get('/api/planningdata/agency?format=ndjson')
+
+    assert _ndjson_rows(response.data) == [{"agency_id": "NMBS", "agency_name": "NMBS/SNCB"}]
+    assert response.headers['X-Total-Count'] == '1'
+
+def test_arrow_pages(client, web_api):
+    if web_api.pa is None:
+        response = client.get('/api/planningdata/stops?format=arrow')
+        assert response.status_code == 400
+        return
+    response = client.get('/api/planningdata/stops?format=arrow&limit=10')
+    table = web_api.pa.ipc.open_stream(response.data).read_all()
+    assert table.num_rows == 10
+    assert response.headers['X-Total-Count'] == '30'
+
+def test_cached_pages_are_precompressed(client):
+    plain = client.get('/api/planningdata/stops')
+    response = client.get('/api/planningdata/stops', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.data) == plain.data
+
+def test_repeated_values_share_one_string(web_api):
+    # Built at runtime, so the strings are not interned by the compiler
+    rows = [{"agency_id": "".join(["NM", "BS"]), "route_id": f"R{i}"} for i in range(20)]
+    web_api._intern_strings(rows)
+
+    assert all(row["agency_id"] is sys.intern("NMBS") for row in rows)
+
+def test_cached_pages_answer_revalidation_with_304(client):
+    response = client.get('/api/planningdata/stops')
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/api/planningdata/stops', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    assert revalidated.headers['ETag'] == etag
+
+def test_etag_follows_the_page_content(client, web_api, data_dir):
+    etag = client.get('/api/planningdata/stops').headers['ETag']
+
+    # A rebuild from the same data keeps the ETag, so clients keep their copy
+    web_api.init_cache()
+    assert client.get('/api/planningdata/stops', headers={'If-None-Match': etag}).status_code == 304
+
+    (data_dir / 'stops.txt').write_text("stop_id,stop_name,stop_lat,stop_lon\n1,New,50.0,4.0\n", encoding='utf-8')
+    web_api.init_cache()
+    response = client.get('/api/planningdata/stops', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_update_swaps_in_the_rebuilt_cache(client, web_api, data_dir, monkeypatch):
+    old_rows = web_api.data_cache['stops.txt']
+    (data_dir / 'stops.txt').write_text("stop_id,stop_name,stop_lat,stop_lon\n1,New,50.0,4.0\n", encoding='utf-8')
+    monkeypatch.setattr(web_api, 'force_update', lambda: True)
+
+    assert client.post('/api/update').status_code == 200
+    for thread in threading.enumerate():
+        if thread.name == 'cache-warmer':
+            thread.join()
+
+    assert web_api.data_cache['stops.txt'] is not old_rows
+    body = client.get('/api/planningdata/stops').get_json()
+    assert body["data"] == [{"stop_id": 1, "stop_lat": 50.0, "stop_lon": 4.0, "stop_name": "New"}]
+    assert len(old_rows) == 30
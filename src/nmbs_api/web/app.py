@@ -4,8 +4,9 @@ Main module for the NMBS Train Data API web server
 import os
 import logging
 import ssl
+import orjson
 from flask import Flask, jsonify
-from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 from .middleware import setup_middleware
 from .routes import api_routes
@@ -23,25 +24,55 @@ load_dotenv()
 # Create cache manager instance
 cache_manager = CacheManager(data_dir='data')
 
-def create_app():
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that parses and serializes with orjson
+    
+    Dates and dataclasses are still handled by DefaultJSONProvider.default, and
+    options orjson cannot express fall back to the standard json module.
+    """
+    
+    def _dumps_bytes(self, obj, indent=None):
+        """Serialize to UTF-8 encoded JSON bytes"""
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+    
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        kwargs.pop('separators', None)
+        if kwargs or indent not in (None, 2):
+            return super().dumps(obj, indent=indent, **kwargs)
+        return self._dumps_bytes(obj, indent).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Same output as DefaultJSONProvider.response, but the body stays bytes
+        # instead of being decoded to str and encoded again by the response
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(self._dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+def create_app(start_services=True):
     """
     Create and configure the Flask application
     
+    Args:
+        start_services (bool): Whether to start the background data service and cache thread
+    
     Returns:
         Flask: The configured Flask application
     """
     # Create Flask app
     app = Flask(__name__)
     
-    # Set up CORS - Toegang voor alle oorsprong toestaan
-    CORS(app, resources={
-        r"/*": {
-            "origins": "*",  # Voor open API toegang
-            "methods": ["GET", "POST", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"]
-        }
-    })
-    logger.info("CORS configuratie toegepast: open toegang voor alle oorsprong")
+    # Match URLs with and without a trailing slash instead of redirecting
+    app.url_map.strict_slashes = False
     
     # Configure JSON pretty printing in a compatible way
     app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
@@ -51,6 +82,7 @@ def create_app():
     # Handle compatibility with different Flask versions
     if hasattr(app, 'json'):
         # Flask 2.x style
+        app.json = OrjsonProvider(app)
         app.json.compact = False
         app.json.sort_keys = False
         app.json.ensure_ascii = False
@@ -62,12 +94,15 @@ def create_app():
             'ensure_ascii': False
         }
     
-    # Set up middleware
+    # Set up middleware, including CORS for all origins
     setup_middleware(app)
     
     # Set up security features
     setup_security(app)
     
+    # Make the cache manager available to the routes
+    app.extensions['cache_manager'] = cache_manager
+    
     # Register the API routes blueprint with a prefix
     app.register_blueprint(api_routes, url_prefix='/api')
     
@@ -76,12 +111,13 @@ def create_app():
     register_metrics_endpoint(app)
     logger.info("Monitoring systeem en /metrics endpoint ingeschakeld")
     
-    # Start the data service in the background
-    logger.info("Starting NMBS data service...")
-    data_service_thread = start_data_service()
-    
-    # Start the cache update thread
-    cache_thread = cache_manager.start_cache_thread()
+    if start_services:
+        # Start the data service in the background
+        logger.info("Starting NMBS data service...")
+        data_service_thread = start_data_service()
+        
+        # Start the cache update thread
+        cache_thread = cache_manager.start_cache_thread()
     
     logger.info("NMBS Web API initialized successfully")
     return app
@@ -96,8 +132,12 @@ def start_web_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
         debug (bool): Whether to run in debug mode
         ssl_context: SSL context for HTTPS support, tuple of (cert, key) paths or 'adhoc'
     """
+    # With the reloader the app is created in the watcher process and again in the
+    # serving child (WERKZEUG_RUN_MAIN=true), only the child fetches data
+    start_services = not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    
     # Create the app
-    app = create_app()
+    app = create_app(start_services=start_services)
     
     # Use the port from .env if not specified
     if port == 5000:
@@ -140,4 +180,17 @@ def start_web_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
     else:
         logger.warning("Running without SSL/HTTPS. This is not recommended for production.")
     
-    app.run(host=host, port=port, debug=debug, ssl_context=ssl_context)
\ No newline at end of file
+    if debug:
+        # Development server with debugger and reloader
+        app.run(host=host, port=port, debug=debug, ssl_context=ssl_context)
+    elif ssl_context:
+        # Waitress does not terminate TLS, keep the threaded Flask server for HTTPS
+        logger.warning("HTTPS is served by the Flask server. Terminate TLS in a reverse proxy to use the production server.")
+        app.run(host=host, port=port, threaded=True, ssl_context=ssl_context)
+    else:
+        # Multi-threaded production WSGI server. A single process keeps one cache
+        # manager and one set of in-memory rate limit counters.
+        from waitress import serve
+        threads = int(os.getenv('API_THREADS', '8'))
+        logger.info(f"Serving with waitress using {threads} threads")
+        serve(app, host=host, port=port, threads=threads)
\ No newline at end of file
@@ -1,16 +1,32 @@
 """
 Cache functionality for the NMBS Train Data API
 """
+import gzip
+import hashlib
 import logging
 import threading
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
 import os
+import orjson
+
+try:
+    import brotli
+except ImportError:  # Optional, the cache is then only precompressed with gzip
+    brotli = None
+
 from ..api import get_realtime_data, get_planning_files_list, get_planning_file
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Number of planning files read at the same time when updating the cache
+CACHE_UPDATE_WORKERS = 8
+
+# Seconds between cache updates, and before retrying after a failed update
+CACHE_UPDATE_INTERVAL = 120
+CACHE_RETRY_INTERVAL = 30
+
 class CacheManager:
     """Manages caching of API data to improve performance"""
     
@@ -22,9 +38,12 @@ class CacheManager:
             data_dir (str): Directory to store cache files
         """
         self.data_dir = data_dir
+        # Replaced as a whole by update_cache, so readers never need a lock
         self.cache_data = {}
-        self.cache_lock = threading.Lock()
+        self.cache_blob = None  # (serialized combined cache, ETag, {encoding: compressed bytes})
         self.cache_thread = None
+        self.refresh_event = threading.Event()
+        self.shutdown_event = threading.Event()
         
         # Ensure data directory exists
         os.makedirs(data_dir, exist_ok=True)
@@ -37,18 +56,28 @@ class CacheManager:
             logger.info("Started cache update thread")
         return self.cache_thread
     
+    def request_refresh(self):
+        """Let the cache thread update the cache now instead of at the next interval"""
+        self.refresh_event.set()
+    
+    def stop_cache_thread(self):
+        """Stop the cache update thread after its current update"""
+        self.shutdown_event.set()
+        self.refresh_event.set()
+    
     def _update_cache_loop(self):
         """Background thread function that updates the cache every 2 minutes"""
         logger.info("Cache update thread is running")
-        while True:
-            try:
-                self.update_cache()
-                # Wait for 2 minutes before updating again
-                time.sleep(120)
-            except Exception as e:
-                logger.error(f"Error in cache update thread: {str(e)}")
+        while not self.shutdown_event.is_set():
+            # The interval counts from the start of the update, not from its end
+            deadline = time.monotonic() + CACHE_UPDATE_INTERVAL
+            if not self.update_cache():
                 # Shorter delay if error occurred
-                time.sleep(30)
+                deadline = time.monotonic() + CACHE_RETRY_INTERVAL
+            
+            # Wait for the next update, an early refresh or shutdown
+            self.refresh_event.wait(max(0, deadline - time.monotonic()))
+            self.refresh_event.clear()
     
     def update_cache(self):
         """Update the cache with the first 25 records of each endpoint"""
@@ -57,6 +86,10 @@ class CacheManager:
             # Get list of planning files
             files = get_planning_files_list()
             
+            # Build the new cache next to the current one, entries that fail to
+            # update keep their previous data
+            new_cache = dict(self.cache_data)
+            
             # Initialize combined cache data
             combined_cache = {
                 "realtime": None,
@@ -66,37 +99,55 @@ class CacheManager:
             # Get realtime data for cache
             realtime_data = get_realtime_data()
             if realtime_data:
-                with self.cache_lock:
-                    self.cache_data['realtime'] = realtime_data
+                new_cache['realtime'] = realtime_data
                 combined_cache["realtime"] = realtime_data
                 logger.info("Added realtime data to combined cache")
             
-            # Get first 25 records for each planning file
-            for file in files:
+            # Get the data with pagination (first 25 records)
+            params = {
+                'page': 0,
+                'page_size': 25,
+                'search': {'query': None, 'field': None},
+                'filters': {},
+                'sort': {'field': None, 'direction': 'asc'}
+            }
+            
+            # Get first 25 records for each planning file, the files are read in parallel
+            # and added in the original order
+            with ThreadPoolExecutor(max_workers=min(CACHE_UPDATE_WORKERS, len(files) or 1)) as executor:
+                futures = [
+                    executor.submit(get_planning_file, file, page=0, page_size=25, search_params=params)
+                    for file in files
+                ]
+            
+            for file, future in zip(files, futures):
                 file_name = file.split('.')[0]  # Remove extension
                 try:
-                    # Get the data with pagination (first 25 records)
-                    params = {
-                        'page': 0,
-                        'page_size': 25,
-                        'search': {'query': None, 'field': None},
-                        'filters': {},
-                        'sort': {'field': None, 'direction': 'asc'}
-                    }
-                    
-                    data = get_planning_file(file, page=0, page_size=25, search_params=params)
+                    data = future.result()
                     
                     if data:
-                        with self.cache_lock:
-                            self.cache_data[file_name] = data
+                        new_cache[file_name] = data
                         combined_cache["planning_data"][file_name] = data
                         logger.info(f"Added {file_name} data to combined cache")
                 except Exception as e:
                     logger.error(f"Error updating cache for {file_name}: {str(e)}")
             
+            # Serialize once, the same bytes are written to disk and served by the API
+            blob = orjson.dumps(combined_cache)
+            etag = hashlib.blake2b(blob, digest_size=8).hexdigest()
+            
+            # Compress once per update so requests only pick the right encoding
+            encoded = {'gzip': gzip.compress(blob, compresslevel=6)}
+            if brotli is not None:
+                encoded['br'] = brotli.compress(blob, quality=4)
+            
+            # Publish the new snapshot, each assignment replaces a reference atomically
+            self.cache_data = new_cache
+            self.cache_blob = (blob, etag, encoded)
+            
             # Save combined data directly to the data folder
-            with open(os.path.join(self.data_dir, "short-test-data.json"), 'w') as f:
-                json.dump(combined_cache, f)
+            with open(os.path.join(self.data_dir, "short-test-data.json"), 'wb') as f:
+                f.write(blob)
             logger.info("Updated short-test-data.json with all cached data")
             
             return True
@@ -114,8 +165,17 @@ class CacheManager:
         Returns:
             dict: The cached data or None if not in cache
         """
-        with self.cache_lock:
-            return self.cache_data.get(data_type)
+        return self.cache_data.get(data_type)
+    
+    def get_cache_blob(self):
+        """
+        Get the combined cache as serialized JSON
+        
+        Returns:
+            tuple: (JSON bytes, ETag, dict of compressed bodies by content encoding)
+                or None if the cache was not built yet
+        """
+        return self.cache_blob
     
     def get_available_cache_types(self):
         """
@@ -124,5 +184,4 @@ class CacheManager:
         Returns:
             list: List of available cache types
         """
-        with self.cache_lock:
-            return list(self.cache_data.keys())
\ No newline at end of file
+        return list(self.cache_data.keys())
\ No newline at end of file
@@ -1,16 +1,100 @@
 """
 Middleware components for the NMBS Train Data API
 """
+import os
 import logging
+import orjson
 from flask import Flask, request, jsonify, redirect
-from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# List of allowed domains - now allowing all hosts
-# ALLOWED_DOMAINS = ['nmbsapi.sanderzijntestjes.be', 'localhost', '127.0.0.1']
+def get_allowed_domains():
+    """
+    Get the allowed domains from the ALLOWED_DOMAINS environment variable
+    
+    ALLOWED_DOMAINS is a comma separated list, e.g.
+    nmbsapi.sanderzijntestjes.be,localhost,127.0.0.1. When it is empty all hosts
+    are allowed to access the API.
+    
+    Returns:
+        frozenset: The allowed host names in lowercase
+    """
+    return frozenset(
+        domain.strip().lower() for domain in os.getenv('ALLOWED_DOMAINS', '').split(',') if domain.strip()
+    )
+
+# Static response for requests to a host that is not allowed
+_FORBIDDEN_BODY = orjson.dumps({
+    "error": "Access denied",
+    "message": "This API is only accessible via https://nmbsapi.sanderzijntestjes.be/",
+    "redirect": "https://nmbsapi.sanderzijntestjes.be/"
+})
+
+# CORS settings, open access for all origins
+CORS_ALLOW_METHODS = "GET, POST, OPTIONS"
+CORS_ALLOW_HEADERS = "Content-Type, Authorization, X-Requested-With"
+
+class CorsHeaders:
+    """
+    WSGI middleware that adds precomputed CORS headers to every response
+    
+    Preflight requests are answered directly, other requests with an Origin
+    header get Access-Control-Allow-Origin added in start_response.
+    """
+    
+    def __init__(self, wsgi_app, allow_methods=CORS_ALLOW_METHODS, allow_headers=CORS_ALLOW_HEADERS):
+        self.wsgi_app = wsgi_app
+        self.preflight_headers = [
+            ('Access-Control-Allow-Origin', '*'),
+            ('Access-Control-Allow-Methods', allow_methods),
+            ('Access-Control-Allow-Headers', allow_headers),
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('Content-Length', '0')
+        ]
+    
+    def __call__(self, environ, start_response):
+        if 'HTTP_ORIGIN' not in environ:
+            return self.wsgi_app(environ, start_response)
+        
+        if environ['REQUEST_METHOD'] == 'OPTIONS' and 'HTTP_ACCESS_CONTROL_REQUEST_METHOD' in environ:
+            start_response('200 OK', list(self.preflight_headers))
+            return [b'']
+        
+        def cors_start_response(status, headers, exc_info=None):
+            headers.append(('Access-Control-Allow-Origin', '*'))
+            return start_response(status, headers, exc_info)
+        
+        return self.wsgi_app(environ, cors_start_response)
+
+class DomainGate:
+    """
+    WSGI middleware that rejects requests for hosts outside the allowed domains
+    
+    Rejected requests get a precomputed 403 response without entering Flask.
+    """
+    
+    def __init__(self, wsgi_app, allowed_domains, forbidden_body=_FORBIDDEN_BODY):
+        self.wsgi_app = wsgi_app
+        self.allowed_domains = frozenset(allowed_domains)
+        self.forbidden_body = forbidden_body
+        self.forbidden_headers = [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(forbidden_body)))
+        ]
+    
+    def __call__(self, environ, start_response):
+        host = environ.get('HTTP_HOST') or environ.get('SERVER_NAME', '')
+        host = host.partition(':')[0].lower()  # Remove port if present
+        
+        # Allow access if the host is in the allowed domains
+        if host in self.allowed_domains:
+            return self.wsgi_app(environ, start_response)
+        
+        logger.warning("Unauthorized access attempt from host: %s", host)
+        start_response('403 FORBIDDEN', list(self.forbidden_headers))
+        return [self.forbidden_body]
 
 def setup_middleware(app):
     """
@@ -19,29 +103,21 @@ def setup_middleware(app):
     Args:
         app (Flask): The Flask application instance
     """
-    # Add CORS support
-    CORS(app)
-    
-    # Add support for proxy headers
-    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-    
-    # Domain validation disabled - allow all hosts to access the API
-    # @app.before_request
-    # def validate_domain():
-    #     """Ensure that the API is only accessed through the proper domain name"""
-    #     host = request.host.split(':')[0]  # Remove port if present
-    #     
-    #     # Log the host for debugging
-    #     logger.debug(f"Request received from host: {host}")
-    #     
-    #     # Allow access if the host is in the allowed domains
-    #     if host in ALLOWED_DOMAINS:
-    #         return None
-    #     
-    #     # For direct IP access, block it
-    #     logger.warning(f"Unauthorized access attempt from host: {host}")
-    #     return jsonify({
-    #         "error": "Access denied",
-    #         "message": "This API is only accessible via https://nmbsapi.sanderzijntestjes.be/",
-    #         "redirect": "https://nmbsapi.sanderzijntestjes.be/"
-    #     }), 403  # Forbidden
\ No newline at end of file
+    # Add CORS support, outside of the Flask request handling
+    app.wsgi_app = CorsHeaders(app.wsgi_app)
+    logger.info("CORS configuratie toegepast: open toegang voor alle oorsprong")
+    
+    # Domain validation, disabled unless ALLOWED_DOMAINS is configured
+    allowed_domains = get_allowed_domains()
+    if allowed_domains:
+        app.wsgi_app = DomainGate(app.wsgi_app, allowed_domains)
+        logger.info("Domain validation enabled for: %s", ', '.join(sorted(allowed_domains)))
+    
+    # Add support for proxy headers. ProxyFix wraps the domain check so the
+    # forwarded host is validated. TRUSTED_PROXIES is the number of proxies in
+    # front of the API, one by default. The X-Forwarded-For, -Proto and -Host
+    # headers are only trusted for that many hops, with 0 a client connecting
+    # directly cannot pass an allowed domain in X-Forwarded-Host.
+    trusted_proxies = int(os.getenv('TRUSTED_PROXIES', 1))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies, x_host=trusted_proxies)
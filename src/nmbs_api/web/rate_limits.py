@@ -3,13 +3,307 @@ Rate limiting configuration for the NMBS Train Data API routes
 This module applies specific rate limits to different API endpoints based on their
 resource usage and typical access patterns.
 """
+import os
+import time
 import logging
-from flask import Blueprint
-from .security import limiter
+import functools
+import threading
+from collections import OrderedDict
+from flask import Blueprint, request, abort
+from flask_limiter.util import get_remote_address
+from limits import parse
+from .security import limiter, RATELIMIT_STORAGE_URI
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Rolling window in a Redis sorted set, evaluated atomically on the server:
+# drop entries older than the window, count the rest and record this request if allowed
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return 1
+end
+return 0
+"""
+
+class SlidingWindowLimiter:
+    """Rolling-window rate limiter that needs a single EVALSHA per request"""
+    
+    def __init__(self, storage_uri):
+        """
+        Initialize the limiter
+        
+        Args:
+            storage_uri (str): Redis connection URI
+        """
+        import redis
+        
+        self.client = redis.Redis.from_url(storage_uri)
+        self.script_sha = None
+    
+    def hit(self, key, amount, window_ms):
+        """
+        Register a request and check if it is within the limit
+        
+        Args:
+            key (str): Key identifying the client and endpoint
+            amount (int): Maximum number of requests in the window
+            window_ms (int): Window size in milliseconds
+            
+        Returns:
+            bool: True if the request is allowed
+        """
+        return self.acquire(key, amount, window_ms) is not None
+    
+    def acquire(self, key, amount, window_ms):
+        """
+        Record a request in the window if it is within the limit
+        
+        Returns:
+            str: The member that was added to the window, or None if the limit was reached
+        """
+        from redis.exceptions import NoScriptError
+        
+        now_ms = int(time.time() * 1000)
+        # Members must be unique, several requests can arrive in the same millisecond
+        member = f"{now_ms}-{os.urandom(4).hex()}"
+        
+        if self.script_sha is None:
+            self.script_sha = self.client.script_load(SLIDING_WINDOW_SCRIPT)
+        try:
+            allowed = self.client.evalsha(self.script_sha, 1, key, now_ms, window_ms, amount, member)
+        except NoScriptError:
+            # Script cache was flushed on the server, load it again
+            self.script_sha = self.client.script_load(SLIDING_WINDOW_SCRIPT)
+            allowed = self.client.evalsha(self.script_sha, 1, key, now_ms, window_ms, amount, member)
+        return member if allowed else None
+    
+    def release(self, key, member):
+        """Remove a request from the window, e.g. when an in-flight request finished"""
+        self.client.zrem(key, member)
+
+_sliding_window_limiter = None
+
+def _get_sliding_window_limiter():
+    """Get the shared sliding window limiter, or None if no Redis storage is configured"""
+    global _sliding_window_limiter
+    if _sliding_window_limiter is None and RATELIMIT_STORAGE_URI.startswith(('redis://', 'rediss://')):
+        _sliding_window_limiter = SlidingWindowLimiter(RATELIMIT_STORAGE_URI)
+    return _sliding_window_limiter
+
+def sliding_window_limit(limit_value):
+    """
+    Rate limit decorator for hot endpoints backed by the Redis sliding window
+    
+    Falls back to the regular Flask-Limiter limit when no Redis storage is configured.
+    
+    Args:
+        limit_value (str): Rate limit, e.g. "60 per minute"
+    """
+    if _get_sliding_window_limiter() is None:
+        return limiter.limit(limit_value)
+    
+    item = parse(limit_value)
+    window_ms = item.get_expiry() * 1000
+    
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = f"nmbs_api:ratelimit:{request.endpoint}:{get_remote_address()}"
+            try:
+                allowed = _get_sliding_window_limiter().hit(key, item.amount, window_ms)
+            except Exception as e:
+                # Don't take the endpoint down when Redis is unreachable
+                logger.error("Sliding window rate limit check failed: %s", e)
+                allowed = True
+            
+            if not allowed:
+                abort(429)
+            return f(*args, **kwargs)
+        
+        # This endpoint is fully handled by the sliding window
+        return limiter.exempt(decorated_function)
+    return decorator
+
+class TokenBucket:
+    """Bucket of request tokens that refills continuously over time"""
+    
+    __slots__ = ('tokens', 'last_refill')
+    
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.last_refill = now
+    
+    def consume(self, capacity, refill_rate, now):
+        """
+        Refill the bucket for the elapsed time and take one token
+        
+        Returns:
+            bool: True if a token was available
+        """
+        self.tokens = min(capacity, self.tokens + (now - self.last_refill) * refill_rate)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket limiter for cheap, read-only endpoints
+    
+    Only protects against abuse, the counters are not shared between workers.
+    Buckets are kept in an LRU so memory stays bounded with many clients.
+    """
+    
+    def __init__(self, capacity, refill_rate, max_keys=10_000):
+        """
+        Initialize the limiter
+        
+        Args:
+            capacity (int): Maximum burst size per client
+            refill_rate (float): Tokens added per second
+            max_keys (int): Maximum number of clients to track
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def hit(self, key):
+        """
+        Register a request and check if it is within the limit
+        
+        Args:
+            key (str): Key identifying the client and endpoint
+            
+        Returns:
+            bool: True if the request is allowed
+        """
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.capacity, now)
+                self.buckets[key] = bucket
+                # Forget the least recently seen client
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.consume(self.capacity, self.refill_rate, now)
+
+def token_bucket_limit(limit_value):
+    """
+    Rate limit decorator using an in-process token bucket
+    
+    Meant for read-only endpoints like the health check that only need abuse
+    protection, so they skip the shared rate limit storage entirely.
+    
+    Args:
+        limit_value (str): Rate limit, e.g. "60 per minute"
+    """
+    item = parse(limit_value)
+    bucket_limiter = TokenBucketLimiter(item.amount, item.amount / item.get_expiry())
+    
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not bucket_limiter.hit(f"{get_remote_address()}:{request.endpoint}"):
+                abort(429)
+            return f(*args, **kwargs)
+        
+        # This endpoint is fully handled by the token bucket
+        return limiter.exempt(decorated_function)
+    return decorator
+
+class ConcurrencyLimiter:
+    """In-process count of the requests each client has in progress"""
+    
+    def __init__(self):
+        self.active = {}
+        self.lock = threading.Lock()
+    
+    def acquire(self, key, max_active):
+        """
+        Register a request that starts
+        
+        Returns:
+            bool: True if the client had less than max_active requests in progress
+        """
+        with self.lock:
+            count = self.active.get(key, 0)
+            if count >= max_active:
+                return False
+            self.active[key] = count + 1
+            return True
+    
+    def release(self, key):
+        """Register a request that finished"""
+        with self.lock:
+            count = self.active.get(key, 1) - 1
+            if count > 0:
+                self.active[key] = count
+            else:
+                self.active.pop(key, None)
+
+def concurrent_limit(max_active, timeout=60):
+    """
+    Limit decorator for the number of requests a client can have in progress
+    
+    Protects slow endpoints against a single client occupying all worker threads,
+    independent of the request rate limits. With Redis storage the requests in
+    progress are tracked in a sorted set shared by all workers, entries of requests
+    that never finished expire after the timeout.
+    
+    Args:
+        max_active (int): Maximum number of requests in progress per client
+        timeout (int): Seconds after which a request no longer counts as in progress
+    """
+    local_limiter = ConcurrencyLimiter()
+    timeout_ms = timeout * 1000
+    
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = f"nmbs_api:concurrent:{request.endpoint}:{get_remote_address()}"
+            redis_limiter = _get_sliding_window_limiter()
+            
+            if redis_limiter is None:
+                if not local_limiter.acquire(key, max_active):
+                    abort(429)
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    local_limiter.release(key)
+            
+            try:
+                member = redis_limiter.acquire(key, max_active, timeout_ms)
+            except Exception as e:
+                # Don't take the endpoint down when Redis is unreachable
+                logger.error("Concurrent request limit check failed: %s", e)
+                return f(*args, **kwargs)
+            
+            if member is None:
+                abort(429)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                try:
+                    redis_limiter.release(key, member)
+                except Exception as e:
+                    logger.error("Releasing concurrent request slot failed: %s", e)
+        return decorated_function
+    return decorator
+
 def apply_rate_limits(blueprint: Blueprint) -> None:
     """
     Apply rate limits to API routes based on their function and resource usage
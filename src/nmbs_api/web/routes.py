@@ -2,13 +2,20 @@
 Route definitions for the NMBS Train Data API
 """
 import logging
-import traceback
 import json
 import os
 import datetime
-from flask import Blueprint, jsonify, request, redirect, Response
+import collections
+import functools
+import gzip
+import threading
+import zlib
+import orjson
+from flask import Blueprint, jsonify, request, redirect, Response, current_app
+from werkzeug.datastructures import MultiDict
 from .utils import extract_request_params
-from .security import limiter, run_security_audit
+from .security import limiter, run_security_audit, validate_input, sanitize_params, log_security_event
+from .rate_limits import sliding_window_limit, token_bucket_limit
 from ..api import (
     get_realtime_data, 
     get_planning_files_list,
@@ -26,6 +33,283 @@ logger = logging.getLogger(__name__)
 # API version and name information
 API_NAME = "NMBS Train Data API"
 API_VERSION = "1.0.0"  # You may want to extract this from a version file
+# Message of 500 responses, the exception text only goes to the log
+INTERNAL_ERROR_MESSAGE = "An unexpected error occurred, please try again later"
+
+# Planning data only changes when it is downloaded again. Responses are cached per
+# data version: the counter is bumped by the update endpoint and the modification
+# time of planning_updated.json covers updates by the background data service.
+PLANNING_UPDATED_FILE = os.path.join('data', 'Planning_gegevens', 'planning_updated.json')
+_planning_version = 0
+
+def _planning_data_version():
+    """Get the current version of the planning data"""
+    try:
+        mtime_ns = os.stat(PLANNING_UPDATED_FILE).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    return _planning_version, mtime_ns
+
+def _json_format():
+    """
+    Get how the JSON provider of the app formats responses
+    
+    Returns:
+        tuple: (indent by two spaces, sort the keys)
+    """
+    provider = current_app.json
+    compact = getattr(provider, 'compact', None)
+    indent = compact is False or (compact is None and current_app.debug)
+    return indent, bool(getattr(provider, 'sort_keys', False))
+
+def _indent_json(body, depth):
+    """
+    Shift indented JSON so it can be nested depth levels deep in another document
+    
+    JSON strings never contain a raw line break, so only the layout is shifted.
+    """
+    return body.replace(b"\n", b"\n" + b"  " * depth) if depth else body
+
+def _dumps_json(obj, json_format, depth=0):
+    """Serialize like the JSON provider of the app, as a value nested depth levels deep"""
+    indent, sort_keys = json_format
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    body = orjson.dumps(obj, option=option)
+    return _indent_json(body, depth) if indent else body
+
+@functools.lru_cache(maxsize=32)
+def _cached_planning_file(filename, page, page_size, params_key, version, json_format):
+    """
+    Read a planning file page; cached per version because parsing large files is expensive
+    
+    Returns:
+        tuple: (data, the records pre-serialized as JSON bytes or None)
+    """
+    data = get_planning_file(filename, page=page, page_size=page_size, search_params=orjson.loads(params_key))
+    
+    # Serialize the records once, they make up almost all of the response body
+    records = None
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        records = data["data"]
+    elif isinstance(data, list):
+        records = data
+    # Encoded as the value of "data" in the response object, one level deep
+    encoded_records = _dumps_json(records, json_format, depth=1) if records is not None else None
+    
+    return data, encoded_records
+
+@functools.lru_cache(maxsize=4)
+def _cached_planning_files(version):
+    """Get the planning file list, cached per version"""
+    return get_planning_files_list()
+
+# Sharded locks so concurrent misses for the same page parse the file only once,
+# while requests for other files and pages normally use a different shard
+PLANNING_LOCK_SHARDS = 64
+_planning_file_locks = [threading.Lock() for _ in range(PLANNING_LOCK_SHARDS)]
+
+def _planning_file(filename, page=0, page_size=1000, search_params=None):
+    """
+    Get a planning file through the response cache
+    
+    The returned data is shared between requests and must not be modified.
+    
+    Returns:
+        tuple: (data, pre-serialized records or None, ETag for the response)
+    """
+    # Canonical form of the search parameters, part of the cache key
+    params_key = orjson.dumps(search_params, option=orjson.OPT_SORT_KEYS)
+    version = _planning_data_version()
+    with _planning_file_locks[hash((filename, page, page_size, params_key)) % PLANNING_LOCK_SHARDS]:
+        data, encoded_records = _cached_planning_file(filename, page, page_size, params_key, version, _json_format())
+    etag = f"{filename}-{version[0]}-{version[1]}-{zlib.crc32(b'%d:%d:%s' % (page, page_size, params_key))}"
+    return data, encoded_records, etag
+
+def _planning_files():
+    """Get the list of planning files through the response cache"""
+    return _cached_planning_files(_planning_data_version())
+
+@functools.lru_cache(maxsize=4)
+def _cached_planning_file_names(version):
+    """
+    Map file names without extension to the planning file to serve, cached per version
+    
+    Extensions are tried in the order .txt, .csv, .cfg. transfers also resolves to
+    stops.txt_transfers.txt when there is no transfers.txt.
+    """
+    files = set(_cached_planning_files(version) or [])
+    names = {}
+    for ext in ('.txt', '.csv', '.cfg'):
+        for file in files:
+            if file.endswith(ext):
+                names.setdefault(file[:-len(ext)], file)
+        # Special case for transfers.txt which might be named stops.txt_transfers.txt
+        if ext == '.txt' and 'stops.txt_transfers.txt' in files:
+            names.setdefault('transfers', 'stops.txt_transfers.txt')
+    return names
+
+def _planning_file_names():
+    """Get the file name resolver for the current planning data"""
+    return _cached_planning_file_names(_planning_data_version())
+
+def _resolve_planning_file(filename):
+    """
+    Get the planning file to serve for a name with or without extension, or None
+    
+    Only files of the current planning data resolve, so a name can never point
+    outside the planning data folder.
+    """
+    if '/' in filename or '\\' in filename or '..' in filename:
+        return None
+    names = _planning_file_names()
+    if '.' in filename:
+        return filename if filename in names.values() else None
+    return names.get(filename)
+
+# Gzipped planning bodies, compressed once per page and metadata instead of per request
+PLANNING_GZIP_MIN_SIZE = 1024
+PLANNING_GZIP_CACHE_SIZE = 32
+_planning_gzip_cache = collections.OrderedDict()
+_planning_gzip_lock = threading.Lock()
+
+def _gzip_planning_body(key, chunks):
+    """
+    Get the gzipped planning response body, compressing it on the first request
+    
+    Args:
+        key: The ETag and the serialized metadata, which together identify the body
+        chunks: The uncompressed response body as byte chunks
+    """
+    with _planning_gzip_lock:
+        compressed = _planning_gzip_cache.get(key)
+        if compressed is not None:
+            _planning_gzip_cache.move_to_end(key)
+            return compressed
+    
+    # Compress outside the lock, at worst two requests compress the same body
+    compressed = gzip.compress(b"".join(chunks), compresslevel=6, mtime=0)
+    with _planning_gzip_lock:
+        _planning_gzip_cache[key] = compressed
+        while len(_planning_gzip_cache) > PLANNING_GZIP_CACHE_SIZE:
+            _planning_gzip_cache.popitem(last=False)
+    return compressed
+
+def _planning_json_chunks(response_data, encoded_records, json_format, depth=0):
+    """
+    Serialize a planning response as a list of byte chunks
+    
+    The layout and key order follow the JSON provider of the app, like jsonify.
+    The pre-serialized records are one of the chunks, so they are sent as is
+    instead of being copied into a new body for every request.
+    
+    Args:
+        response_data (dict): The response object
+        encoded_records (bytes): The records as encoded by _cached_planning_file, or None
+        json_format (tuple): The format from _json_format
+        depth (int): Nesting level of the response object in the document
+    """
+    indent, sort_keys = json_format
+    if not response_data:
+        return [b"{}"]
+    
+    keys = sorted(response_data) if sort_keys else response_data
+    newline = b"\n" + b"  " * (depth + 1) if indent else b""
+    separator = b": " if indent else b":"
+    chunks = []
+    for key in keys:
+        chunks.append((b"," if chunks else b"{") + newline)
+        chunks.append(orjson.dumps(key) + separator)
+        if key == "data" and encoded_records is not None:
+            chunks.append(_indent_json(encoded_records, depth) if indent else encoded_records)
+        else:
+            chunks.append(_dumps_json(response_data[key], json_format, depth + 1))
+    chunks.append((b"\n" + b"  " * depth if indent else b"") + b"}")
+    return chunks
+
+def _planning_json_response(response_data, encoded_records, etag):
+    """
+    Create the JSON response for a planning file with a weak ETag
+    
+    The body matches jsonify, but reuses the pre-serialized records.
+    Clients sending a matching If-None-Match header get a 304 Not Modified, clients
+    accepting gzip get a compressed body that is shared between requests.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    chunks = _planning_json_chunks(response_data, encoded_records, _json_format())
+    # jsonify ends the body with a line break
+    chunks.append(b"\n")
+    size = sum(map(len, chunks))
+    
+    if encoded_records is not None and size >= PLANNING_GZIP_MIN_SIZE and request.accept_encodings['gzip']:
+        # Everything besides the records is small, so it is part of the cache key
+        metadata_key = b"".join(chunk for chunk in chunks if chunk is not encoded_records)
+        response = Response(_gzip_planning_body((etag, metadata_key), chunks), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        # The chunks are written one after the other, the length is known up front
+        response = Response(chunks, mimetype='application/json')
+        response.content_length = size
+    response.vary.add('Accept-Encoding')
+    # Weak because the metadata can change without the planning data changing
+    response.set_etag(etag, weak=True)
+    return response
+
+def _invalidate_planning_cache():
+    """Drop cached planning responses after the data was updated"""
+    global _planning_version
+    _planning_version += 1
+    with _planning_gzip_lock:
+        _planning_gzip_cache.clear()
+
+# The realtime response is serialized once per download and shared by all clients.
+# last_updated.json is rewritten after every realtime download, its mtime is the version.
+REALTIME_UPDATED_FILE = os.path.join('data', 'Real-time_gegevens', 'last_updated.json')
+_realtime_snapshot = (None, None)  # (version, serialized response or None)
+_realtime_snapshot_lock = threading.Lock()
+
+def _get_realtime_snapshot():
+    """
+    Get the serialized realtime response for the latest download
+    
+    Readers take the published tuple without locking, only a rebuild is serialized.
+    
+    Only a successfully read download is kept, so a failed read is retried by
+    the next request instead of being served until the next download.
+    
+    Returns:
+        tuple: (version as mtime in nanoseconds or None, response body or None)
+    """
+    global _realtime_snapshot
+    try:
+        version = os.stat(REALTIME_UPDATED_FILE).st_mtime_ns
+    except OSError:
+        return None, None
+    
+    snapshot = _realtime_snapshot
+    if snapshot[0] == version:
+        return snapshot
+    
+    with _realtime_snapshot_lock:
+        if _realtime_snapshot[0] == version:
+            return _realtime_snapshot
+        
+        data = get_realtime_data()
+        if not data:
+            # Failed or half-written download, try again on the next request
+            return version, None
+        
+        response_data = add_metadata_to_response(data, endpoint_name='/api/realtime/data', file_type='realtime')
+        # Same layout as jsonify
+        _realtime_snapshot = (version, _dumps_json(response_data, _json_format()) + b"\n")
+        return _realtime_snapshot
 
 def add_metadata_to_response(data, endpoint_name=None, file_type=None):
     """
@@ -132,7 +416,7 @@ api_bp.register_blueprint(test_api, url_prefix='/tests')
 
 # Apply rate limit directly to endpoints that are defined in the api_bp
 @api_bp.route('/health', methods=['GET'])
-@limiter.limit("60 per minute")
+@token_bucket_limit("60 per minute")
 def health():
     """Check if the API is healthy"""
     return jsonify({'status': 'healthy'})
@@ -140,17 +424,28 @@ def health():
 # Create a blueprint for routes
 api_routes = Blueprint('api', __name__)
 
+# Validate the query parameters of the API endpoints only, /metrics has none
+api_routes.before_request(validate_input)
+
+@api_routes.after_request
+def make_conditional_response(response):
+    """Answer If-None-Match / If-Modified-Since with 304 Not Modified for responses with an ETag"""
+    if request.method in ('GET', 'HEAD') and response.status_code == 200 and 'ETag' in response.headers:
+        return response.make_conditional(request)
+    return response
+
 @api_routes.route('/', methods=['GET'])
 def root():
     """Root endpoint that redirects to the health check"""
     return redirect('/api/health')
 
 @api_routes.route('/health', methods=['GET'])
-@limiter.limit("60 per minute")
+@token_bucket_limit("60 per minute")
 def health_check():
     """Simple health check endpoint"""
     host = request.headers.get('Host', 'unknown')
-    logger.info(f"Health check received from host: {host}")
+    # Health checks are polled by load balancers, only log them when debugging
+    logger.debug("Health check received from host: %s", host)
     return jsonify({
         "status": "healthy", 
         "service": "NMBS Train Data API",
@@ -159,24 +454,25 @@ def health_check():
 
 # Realtime data endpoints
 @api_routes.route('/realtime/data', methods=['GET'])
-@limiter.limit("30 per minute")
+@sliding_window_limit("30 per minute")
 def get_realtime_data_endpoint():
     """
     Get the latest real-time train data with track changes
     """
     try:
-        # Get the data
-        data = get_realtime_data()
+        # Get the serialized data of the latest download
+        version, body = _get_realtime_snapshot()
         
-        if data:
-            # Add metadata to the response
-            response_data = add_metadata_to_response(data, endpoint_name='/api/realtime/data', file_type='realtime')
-            return jsonify(response_data)
+        if body:
+            response = Response(body, mimetype='application/json')
+            response.set_etag(f"realtime-{version}")
+            response.last_modified = version // 1_000_000_000
+            return response
         else:
             return jsonify({"error": "No realtime data available"}), 404
-    except Exception as e:
-        logger.error(f"Error getting realtime data: {str(e)}")
-        return jsonify({"error": "Error processing request", "message": str(e)}), 500
+    except Exception:
+        logger.exception("Error getting realtime data")
+        return jsonify({"error": "Error processing request", "message": INTERNAL_ERROR_MESSAGE}), 500
 
 # Planning data endpoints
 @api_routes.route('/planningdata/files', methods=['GET'])
@@ -186,15 +482,23 @@ def get_planning_files_endpoint():
     Get a list of all available planning data files
     """
     try:
-        files = get_planning_files_list()
+        files = _planning_files()
         
         if files:
             return jsonify({"files": files})
         else:
             return jsonify({"error": "No planning data files available"}), 404
-    except Exception as e:
-        logger.error(f"Error getting planning files: {str(e)}")
-        return jsonify({"error": "Error processing request", "message": str(e)}), 500
+    except Exception:
+        logger.exception("Error getting planning files")
+        return jsonify({"error": "Error processing request", "message": INTERNAL_ERROR_MESSAGE}), 500
+
+@functools.lru_cache(maxsize=8)
+def _planning_endpoint_urls(base_url, version):
+    """Map each planning file without extension to its endpoint URL, cached per host and data version"""
+    return {
+        file_name: f"{base_url}/api/planningdata/{file_name}"
+        for file_name in (file.split('.')[0] for file in _cached_planning_files(version))
+    }
 
 @api_routes.route('/planningdata/data', methods=['GET'])
 @limiter.limit("60 per minute")
@@ -203,27 +507,148 @@ def get_all_planning_data():
     Get a combined response with references to all planning data endpoints
     """
     try:
-        files = get_planning_files_list()
+        files = _planning_files()
         
         if not files:
             return jsonify({"error": "No planning data available"}), 404
         
         # Create a response with URLs to each file endpoint
-        base_url = request.host_url.rstrip('/')
-        file_urls = {}
-        
-        for file in files:
-            file_name = file.split('.')[0]  # Remove extension
-            file_urls[file_name] = f"{base_url}/api/planningdata/{file_name}"
+        file_urls = _planning_endpoint_urls(request.host_url.rstrip('/'), _planning_data_version())
         
         return jsonify({
             "message": "Planning data available at the following endpoints",
             "files": files,
             "endpoints": file_urls
         })
-    except Exception as e:
-        logger.error(f"Error getting all planning data: {str(e)}")
-        return jsonify({"error": "Error processing request", "message": str(e)}), 500
+    except Exception:
+        logger.exception("Error getting all planning data")
+        return jsonify({"error": "Error processing request", "message": INTERNAL_ERROR_MESSAGE}), 500
+
+# Maximum number of queries in one batch request
+PLANNING_BATCH_MAX_QUERIES = 10
+# Maximum number of rows a batch asks for over all its queries, one request of the single file endpoint
+PLANNING_BATCH_MAX_ROWS = 5000
+
+def _batch_query_params(query):
+    """
+    Validate and sanitize the parameters of one batch query
+    
+    The values go through the same checks as the query string of the single
+    file endpoint, so a query that endpoint rejects with a 400 is rejected here.
+    
+    Returns:
+        tuple: (params from extract_request_params, None) or (None, error object)
+    """
+    args = {key: value for key, value in query.items() if key != 'file'}
+    
+    # Only strings and numbers have a query string form, str(True) or str(None) would be misread
+    invalid = sorted(key for key, value in args.items()
+                     if isinstance(value, bool) or not isinstance(value, (str, int, float)))
+    if invalid:
+        return None, {
+            "error": "Invalid query parameters",
+            "message": "Parameter values must be strings or numbers",
+            "params": invalid
+        }
+    
+    sanitized, validation_errors = sanitize_params({key: str(value) for key, value in args.items()})
+    if validation_errors:
+        log_security_event('input_validation_failure', {
+            'errors': validation_errors,
+            'path': request.path
+        })
+        return None, {
+            "error": "Invalid query parameters",
+            "message": "Invalid request parameters",
+            "params": [error['param'] for error in validation_errors]
+        }
+    
+    return extract_request_params(MultiDict({key: str(value) for key, value in sanitized.items()})), None
+
+@api_routes.route('/planningdata/batch', methods=['POST'])
+@limiter.limit("15 per minute")
+def get_planning_data_batch():
+    """
+    Answer several planning file queries in one request
+    
+    Request Body:
+        A JSON array of queries. Each query has a "file" (with or without extension)
+        and the query parameters of /planningdata/<filename>, e.g.
+        [{"file": "stops", "limit": 10}, {"file": "routes", "page": 1, "route_type": "2"}]
+    
+    Returns:
+        {"results": [...]} with a response or an error object for each query, in order
+    """
+    queries = request.get_json(silent=True)
+    if not isinstance(queries, list) or not all(isinstance(query, dict) and isinstance(query.get('file'), str) for query in queries):
+        return jsonify({
+            "error": "Invalid batch request",
+            "message": "Expected a JSON array of objects with a 'file' field"
+        }), 400
+    if len(queries) > PLANNING_BATCH_MAX_QUERIES:
+        return jsonify({
+            "error": "Invalid batch request",
+            "message": f"A batch can contain at most {PLANNING_BATCH_MAX_QUERIES} queries"
+        }), 400
+    
+    # Validate every query first, so the row limit is known before any file is read
+    filenames = [_resolve_planning_file(query['file']) for query in queries]
+    validated = [_batch_query_params(query) for query in queries]
+    total_rows = sum(params['page_size'] for filename, (params, _) in zip(filenames, validated)
+                     if filename and params is not None)
+    if total_rows > PLANNING_BATCH_MAX_ROWS:
+        return jsonify({
+            "error": "Invalid batch request",
+            "message": f"A batch can ask for at most {PLANNING_BATCH_MAX_ROWS} rows, set a smaller limit"
+        }), 400
+    
+    try:
+        # Byte chunks of the response body, laid out like jsonify({"results": [...]})
+        json_format = _json_format()
+        indent = json_format[0]
+        chunks = [b'{\n  "results": [' if indent else b'{"results":[']
+        for index, (query, filename, (params, error)) in enumerate(zip(queries, filenames, validated)):
+            chunks.append((b"," if index else b"") + (b"\n    " if indent else b""))
+            if not filename:
+                chunks.append(_dumps_json({"error": f"Planning file '{query['file']}' not found"}, json_format, 2))
+                continue
+            if error is not None:
+                chunks.append(_dumps_json(error, json_format, 2))
+                continue
+            
+            data, encoded_records, etag = _planning_file(
+                filename,
+                page=params['page'],
+                page_size=params['page_size'],
+                search_params=params
+            )
+            
+            if not data:
+                chunks.append(_dumps_json({"error": f"Could not parse planning file '{filename}'"}, json_format, 2))
+                continue
+            
+            file_type = filename.split('.')[0]
+            response_data = add_metadata_to_response(
+                data,
+                endpoint_name=f'/api/planningdata/{file_type}',
+                file_type=file_type
+            )
+            chunks.extend(_planning_json_chunks(response_data, encoded_records, json_format, depth=2))
+        if indent:
+            chunks.append(b"\n  ]\n}\n" if queries else b"]\n}\n")
+        else:
+            chunks.append(b"]}\n")
+        
+        logger.info(f"Answered planning batch with {len(queries)} queries")
+        response = Response(chunks, mimetype='application/json')
+        response.content_length = sum(map(len, chunks))
+        return response
+    except Exception:
+        logger.exception("Error processing planning batch")
+        return jsonify({
+            "error": "Error processing request",
+            "message": INTERNAL_ERROR_MESSAGE
+        }), 500
 
 @api_routes.route('/planningdata/<filename>', methods=['GET'])
 @limiter.limit("45 per minute")
@@ -246,31 +671,11 @@ def get_specific_planning_file(filename):
         # Extract request parameters using our improved utility
         params = extract_request_params()
         
-        # Check if filename already has an extension
-        if '.' not in filename:
-            # Check for various extensions
-            possible_extensions = ['.txt', '.csv', '.cfg']
-            found_file = None
-            
-            for ext in possible_extensions:
-                file_with_ext = f"{filename}{ext}"
-                files = get_planning_files_list()
-                
-                if file_with_ext in files:
-                    found_file = file_with_ext
-                    break
-                
-                # Special case for transfers.txt which might be named stops.txt_transfers.txt
-                if filename == 'transfers':
-                    special_name = 'stops.txt_transfers.txt'
-                    if special_name in files:
-                        found_file = special_name
-                        break
-            
-            if not found_file:
-                return jsonify({"error": f"Planning file '{filename}' not found"}), 404
-            
-            filename = found_file
+        # Add the extension if the filename has none
+        found_file = _resolve_planning_file(filename)
+        if not found_file:
+            return jsonify({"error": f"Planning file '{filename}' not found"}), 404
+        filename = found_file
         
         # Log request details
         logger.info(f"Fetching planning file: {filename}")
@@ -281,7 +686,7 @@ def get_specific_planning_file(filename):
             logger.info(f"Filters: {params['filters']}")
         
         # Get the file content with pagination
-        data = get_planning_file(
+        data, encoded_records, etag = _planning_file(
             filename, 
             page=params['page'], 
             page_size=params['page_size'],
@@ -297,24 +702,34 @@ def get_specific_planning_file(filename):
                 endpoint_name=f'/api/planningdata/{file_type}', 
                 file_type=file_type
             )
-            return jsonify(response_data)
+            return _planning_json_response(response_data, encoded_records, etag)
         else:
             return jsonify({"error": f"Could not parse planning file '{filename}'"}), 404
-    except Exception as e:
-        logger.error(f"Error processing request for file {filename}: {str(e)}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Error processing request for file %s", filename)
         return jsonify({
-            "error": f"Error processing request", 
-            "message": str(e)
+            "error": "Error processing request",
+            "message": INTERNAL_ERROR_MESSAGE
         }), 500
 
 # Direct endpoints for common GTFS files with auto-filling filename extensions
+# (data type, file name, rate limit, description used in error messages)
+PLANNING_ENDPOINTS = [
+    ('stops', 'stops.txt', "45 per minute", "stops"),
+    ('routes', 'routes.txt', "45 per minute", "routes"),
+    ('calendar', 'calendar.txt', "45 per minute", "calendar"),
+    ('trips', 'trips.txt', "45 per minute", "trips"),
+    ('stop_times', 'stop_times.txt', "30 per minute", "stop times"),
+]
 
-@api_routes.route('/planningdata/stops', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_stops_data():
+def _serve_planning(filename, file_type, description):
     """
-    Get the stops.txt data with station information
+    Get one page of a GTFS planning file
+    
+    Args:
+        filename: The planning file to read (e.g., 'stops.txt')
+        file_type: The data type reported in the metadata (e.g., 'stops')
+        description: Description of the data used in error messages
     
     Query Parameters:
         page (int): Page number starting from 0 (default: 0)
@@ -328,9 +743,15 @@ def get_stops_data():
         # Extract request parameters
         params = extract_request_params()
         
+        # Log the request details for stop_times due to its size
+        if file_type == 'stop_times':
+            logger.info(f"Stop Times request - page: {params['page']}, limit: {params['page_size']}")
+            if params['filters']:
+                logger.info(f"Stop Times filters: {params['filters']}")
+        
         # Get the data with pagination and search parameters
-        data = get_planning_file(
-            'stops.txt', 
+        data, encoded_records, etag = _planning_file(
+            filename, 
             page=params['page'], 
             page_size=params['page_size'],
             search_params=params
@@ -338,200 +759,106 @@ def get_stops_data():
         
         if data:
             # Add metadata to the response
-            response_data = add_metadata_to_response(data, endpoint_name='/api/planningdata/stops', file_type='stops')
-            return jsonify(response_data)
+            response_data = add_metadata_to_response(data, endpoint_name=f'/api/planningdata/{file_type}', file_type=file_type)
+            return _planning_json_response(response_data, encoded_records, etag)
         else:
-            return jsonify({"error": "No stops data available"}), 404
-    except Exception as e:
-        logger.error(f"Error fetching stops data: {str(e)}")
-        logger.error(traceback.format_exc())
+            return jsonify({"error": f"No {description} data available"}), 404
+    except Exception:
+        logger.exception("Error fetching %s data", file_type)
         return jsonify({
-            "error": "Error processing request", 
-            "message": str(e)
+            "error": "Error processing request",
+            "message": INTERNAL_ERROR_MESSAGE
         }), 500
 
-@api_routes.route('/planningdata/routes', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_routes_data():
-    """
-    Get the routes.txt data with route information
+def _make_planning_view(filename, file_type, description):
+    """Create the view function for a direct planning data endpoint"""
+    def view():
+        return _serve_planning(filename, file_type, description)
     
-    Query Parameters:
-        page (int): Page number starting from 0 (default: 0)
-        limit (int): Number of records per page (default: 1000, max: 5000)
-        search (str): Field to search in (e.g., 'route_long_name')
-        <search> (str): Value to filter by for the specified search field
-        sort_by (str): Field to sort by
-        sort_direction (str): Sort direction (asc or desc)
-    """
-    try:
-        # Extract request parameters
-        params = extract_request_params()
-        
-        # Get the data with pagination and search parameters
-        data = get_planning_file(
-            'routes.txt', 
-            page=params['page'], 
-            page_size=params['page_size'],
-            search_params=params
-        )
-        
-        if data:
-            # Add metadata to the response
-            response_data = add_metadata_to_response(data, endpoint_name='/api/planningdata/routes', file_type='routes')
-            return jsonify(response_data)
-        else:
-            return jsonify({"error": "No routes data available"}), 404
-    except Exception as e:
-        logger.error(f"Error fetching routes data: {str(e)}")
-        return jsonify({
-            "error": "Error processing request", 
-            "message": str(e)
-        }), 500
+    # Unique names keep the endpoints and their rate limits apart
+    view.__name__ = view.__qualname__ = f"get_{file_type}_data"
+    view.__doc__ = f"Get the {filename} data"
+    return view
 
-@api_routes.route('/planningdata/calendar', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_calendar_data():
-    """
-    Get the calendar.txt data with service calendar information
+for _file_type, _filename, _rate_limit, _description in PLANNING_ENDPOINTS:
+    api_routes.add_url_rule(
+        f'/planningdata/{_file_type}',
+        view_func=limiter.limit(_rate_limit)(_make_planning_view(_filename, _file_type, _description)),
+        methods=['GET'],
+        # CORS preflights are answered by the middleware
+        provide_automatic_options=False
+    )
+
+# Add more standard GTFS file endpoints, these resolve the file extension like
+# /planningdata/<filename> does (data type, rate limit, docstring)
+PLANNING_FILE_ENDPOINTS = [
+    ('calendar_dates', "45 per minute", "Get the calendar_dates.txt data with exception dates"),
+    ('agency', "45 per minute", "Get the agency.txt data with carrier information"),
+    ('translations', "45 per minute", "Get the translations.txt data with translation information"),
+]
+
+def _make_planning_file_view(file_type, doc):
+    """Create the view function for a planning file served by name"""
+    def view():
+        return get_specific_planning_file(file_type)
     
-    Query Parameters:
-        page (int): Page number starting from 0 (default: 0)
-        limit (int): Number of records per page (default: 1000, max: 5000)
-        search (str): Field to search in (e.g., 'service_id', 'monday', etc.)
-        <search> (str): Value to filter by for the specified search field
-        sort_by (str): Field to sort by
-        sort_direction (str): Sort direction (asc or desc)
-    """
-    try:
-        # Extract request parameters
-        params = extract_request_params()
-        
-        # Get the data with pagination and search parameters
-        data = get_planning_file(
-            'calendar.txt', 
-            page=params['page'], 
-            page_size=params['page_size'],
-            search_params=params
-        )
-        
-        if data:
-            # Add metadata to the response
-            response_data = add_metadata_to_response(data, endpoint_name='/api/planningdata/calendar', file_type='calendar')
-            return jsonify(response_data)
-        else:
-            return jsonify({"error": "No calendar data available"}), 404
-    except Exception as e:
-        logger.error(f"Error fetching calendar data: {str(e)}")
-        return jsonify({
-            "error": "Error processing request", 
-            "message": str(e)
-        }), 500
+    view.__name__ = view.__qualname__ = f"get_{file_type}_data"
+    view.__doc__ = doc
+    return view
 
-@api_routes.route('/planningdata/trips', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_trips_data():
+for _file_type, _rate_limit, _doc in PLANNING_FILE_ENDPOINTS:
+    api_routes.add_url_rule(
+        f'/planningdata/{_file_type}',
+        view_func=limiter.limit(_rate_limit)(_make_planning_file_view(_file_type, _doc)),
+        methods=['GET'],
+        provide_automatic_options=False
+    )
+
+# Cache endpoints, clients may reuse the responses for a minute and revalidate with the ETag
+CACHE_MAX_AGE = 60
+
+def _set_cache_headers(response):
+    """Mark a cache endpoint response as publicly cacheable"""
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+@api_routes.route('/cache/all', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_all_cached_data():
     """
-    Get the trips.txt data with trip information
-    
-    Query Parameters:
-        page (int): Page number starting from 0 (default: 0)
-        limit (int): Number of records per page (default: 1000, max: 5000)
-        search (str): Field to search in (e.g., 'route_id', 'trip_id', etc.)
-        <search> (str): Value to filter by for the specified search field
-        sort_by (str): Field to sort by
-        sort_direction (str): Sort direction (asc or desc)
+    Get the combined cache (first 25 records of each type) as built by the cache thread
     """
-    try:
-        # Extract request parameters
-        params = extract_request_params()
-        
-        # Get the data with pagination and search parameters
-        data = get_planning_file(
-            'trips.txt', 
-            page=params['page'], 
-            page_size=params['page_size'],
-            search_params=params
-        )
-        
-        if data:
-            # Add metadata to the response
-            response_data = add_metadata_to_response(data, endpoint_name='/api/planningdata/trips', file_type='trips')
-            return jsonify(response_data)
-        else:
-            return jsonify({"error": "No trips data available"}), 404
-    except Exception as e:
-        logger.error(f"Error fetching trips data: {str(e)}")
+    cache_manager = current_app.extensions.get('cache_manager')
+    cache_blob = cache_manager.get_cache_blob() if cache_manager else None
+    if not cache_blob:
         return jsonify({
-            "error": "Error processing request", 
-            "message": str(e)
-        }), 500
-
-@api_routes.route('/planningdata/stop_times', methods=['GET'])
-@limiter.limit("30 per minute")
-def get_stop_times_data():
-    """
-    Get the stop_times.txt data with stop time information
+            "error": "No cached data available",
+            "message": "The cache is updated every 2 minutes. Try again later or use the full data endpoint."
+        }), 404
     
-    Query Parameters:
-        page (int): Page number starting from 0 (default: 0)
-        limit (int): Number of records per page (default: 1000, max: 5000)
-        search (str): Field to search in (e.g., 'stop_id', 'trip_id', etc.)
-        <search> (str): Value to filter by for the specified search field
-        sort_by (str): Field to sort by (e.g., 'arrival_time')
-        sort_direction (str): Sort direction (asc or desc)
-    """
-    try:
-        # Extract request parameters
-        params = extract_request_params()
-        
-        # Log the request details for stop_times due to its size
-        logger.info(f"Stop Times request - page: {params['page']}, limit: {params['page_size']}")
-        if params['filters']:
-            logger.info(f"Stop Times filters: {params['filters']}")
-        
-        # Get the data with pagination and search parameters
-        data = get_planning_file(
-            'stop_times.txt', 
-            page=params['page'], 
-            page_size=params['page_size'],
-            search_params=params
-        )
-        
-        if data:
-            # Add metadata to the response
-            response_data = add_metadata_to_response(data, endpoint_name='/api/planningdata/stop_times', file_type='stop_times')
-            return jsonify(response_data)
+    # The combined cache is serialized and compressed once per update and sent as is
+    blob, etag, encoded = cache_blob
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        encoding = request.accept_encodings.best_match([name for name in ('br', 'gzip') if name in encoded])
+        if encoding:
+            response = Response(encoded[encoding], mimetype='application/json')
+            response.headers['Content-Encoding'] = encoding
         else:
-            return jsonify({"error": "No stop times data available"}), 404
-    except Exception as e:
-        logger.error(f"Error fetching stop_times data: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({
-            "error": "Error processing request", 
-            "message": str(e)
-        }), 500
-
-# Add more standard GTFS file endpoints
-@api_routes.route('/planningdata/calendar_dates', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_calendar_dates_data():
-    """Get the calendar_dates.txt data with exception dates"""
-    return get_specific_planning_file('calendar_dates')
-
-@api_routes.route('/planningdata/agency', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_agency_data():
-    """Get the agency.txt data with carrier information"""
-    return get_specific_planning_file('agency')
+            response = Response(blob, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    return _set_cache_headers(response)
 
-@api_routes.route('/planningdata/translations', methods=['GET'])
-@limiter.limit("45 per minute")
-def get_translations_data():
-    """Get the translations.txt data with translation information"""
-    return get_specific_planning_file('translations')
+@functools.lru_cache(maxsize=16)
+def _cache_file_body(cache_file, etag):
+    """Parse a cache file and build the response body once per version of the file"""
+    with open(cache_file, 'rb') as f:
+        cached_data = orjson.loads(f.read())
+    return jsonify(cached_data).get_data()
 
-# Cache endpoints
 @api_routes.route('/cache/<data_type>', methods=['GET'])
 @limiter.limit("60 per minute")
 def get_cached_data(data_type):
@@ -545,25 +872,41 @@ def get_cached_data(data_type):
         # Check if the cache file exists
         cache_file = os.path.join('data', f"{data_type}_cache.json")
         
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r') as f:
-                cached_data = json.load(f)
-            
-            logger.info(f"Returned cached data for {data_type}")
-            return jsonify(cached_data)
-        else:
+        try:
+            stat = os.stat(cache_file)
+        except FileNotFoundError:
             # If not in cache, return a message
             return jsonify({
                 "error": f"No cached data available for {data_type}",
                 "message": "The cache is updated every 2 minutes. Try again later or use the full data endpoint."
             }), 404
-    except Exception as e:
-        logger.error(f"Error retrieving cached data for {data_type}: {str(e)}")
+        
+        # Clients that already have this version of the cache file get a 304
+        etag = f"{data_type}-{stat.st_mtime_ns}-{stat.st_size}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return _set_cache_headers(response)
+        
+        body = _cache_file_body(cache_file, etag)
+        
+        logger.info(f"Returned cached data for {data_type}")
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.last_modified = int(stat.st_mtime)
+        return _set_cache_headers(response)
+    except Exception:
+        logger.exception("Error retrieving cached data for %s", data_type)
         return jsonify({
             "error": "Error retrieving cached data",
-            "message": str(e)
+            "message": INTERNAL_ERROR_MESSAGE
         }), 500
 
+@functools.lru_cache(maxsize=1)
+def _cache_types(data_dir_mtime_ns):
+    """List the cached data types, cached until files are added to or removed from the data folder"""
+    return [f.replace('_cache.json', '') for f in os.listdir('data') if f.endswith('_cache.json')]
+
 @api_routes.route('/cache', methods=['GET'])
 @limiter.limit("90 per minute")
 def get_available_cache():
@@ -571,26 +914,26 @@ def get_available_cache():
     Get a list of available cached data types
     """
     try:
-        cache_files = [f.replace('_cache.json', '') for f in os.listdir('data') if f.endswith('_cache.json')]
+        cache_files = _cache_types(os.stat('data').st_mtime_ns)
         
         # Create a response with URLs to each cache endpoint
         base_url = request.host_url.rstrip('/')
-        cache_urls = {}
+        cache_urls = {cache_type: f"{base_url}/api/cache/{cache_type}" for cache_type in cache_files}
         
-        for cache_type in cache_files:
-            cache_urls[cache_type] = f"{base_url}/api/cache/{cache_type}"
-        
-        return jsonify({
+        response = jsonify({
             "message": "Cached data available (first 25 records of each type)",
             "cache_types": cache_files,
             "endpoints": cache_urls,
             "update_frequency": "Every 2 minutes"
         })
-    except Exception as e:
-        logger.error(f"Error retrieving available cache: {str(e)}")
+        # The listing is small, an ETag over the body lets clients revalidate it
+        response.add_etag()
+        return _set_cache_headers(response)
+    except Exception:
+        logger.exception("Error retrieving available cache")
         return jsonify({
             "error": "Error retrieving available cache",
-            "message": str(e)
+            "message": INTERNAL_ERROR_MESSAGE
         }), 500
 
 # Compatibility with old endpoint - now redirects to new endpoint with deprecation message
@@ -603,12 +946,13 @@ def get_data():
     logger.warning("Deprecated endpoint '/api/data' used. This endpoint is no longer supported.")
     
     # Return a clear error message with redirection information
+    base_url = request.host_url.rstrip('/')
     return jsonify({
         "error": "Endpoint deprecated",
         "message": "The /api/data endpoint is no longer available. Please use the new endpoints:",
         "new_endpoints": {
-            "realtime_data": request.host_url.rstrip('/') + "/api/realtime/data",
-            "planning_data": request.host_url.rstrip('/') + "/api/planningdata/data"
+            "realtime_data": f"{base_url}/api/realtime/data",
+            "planning_data": f"{base_url}/api/planningdata/data"
         }
     }), 410  # 410 Gone status code
 
@@ -622,21 +966,10 @@ def update_data_endpoint():
     try:
         # Valideer de JSON input als die aanwezig is
         if request.is_json:
-            from jsonschema import validate, ValidationError
-            
-            # Schema voor het update endpoint
-            UPDATE_SCHEMA = {
-                "type": "object",
-                "properties": {
-                    "force": {"type": "boolean"},
-                    "update_type": {"type": "string", "enum": ["realtime", "planning", "all"]},
-                    "clear_cache": {"type": "boolean"}
-                },
-                "required": ["force"]
-            }
+            from .validation import validate_instance, ValidationError, UPDATE_SCHEMA
             
             try:
-                validate(instance=request.json, schema=UPDATE_SCHEMA)
+                validate_instance('update', request.json)
                 # Gebruik parameters uit request als die geldig zijn
                 force = request.json.get("force", True)
                 update_type = request.json.get("update_type", "all")
@@ -646,7 +979,7 @@ def update_data_endpoint():
                 logger.warning(f"Ongeldige JSON voor update: {e}")
                 return jsonify({
                     "error": "Ongeldige JSON data", 
-                    "details": str(e),
+                    "details": e.message,
                     "schema": UPDATE_SCHEMA
                 }), 400
         else:
@@ -659,6 +992,12 @@ def update_data_endpoint():
         
         # Voer de update uit
         success = force_update()
+        if success:
+            _invalidate_planning_cache()
+            # Rebuild the cache with the new data instead of waiting for the next interval
+            cache_manager = current_app.extensions.get('cache_manager')
+            if cache_manager:
+                cache_manager.request_refresh()
         
         # Bereken duur van de update
         elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
@@ -702,10 +1041,10 @@ def update_data_endpoint():
             }), 500
             
     except Exception as e:
-        logger.error(f"Error updating data: {str(e)}")
+        logger.exception("Error updating data")
         # Registreer een fout
         record_error("update", "Exception", str(e))
-        return jsonify({"error": "Error updating data", "message": str(e)}), 500
+        return jsonify({"error": "Error updating data", "message": INTERNAL_ERROR_MESSAGE}), 500
 
 @api_routes.route('/security/audit', methods=['GET'])
 @limiter.limit("10 per minute")
@@ -722,18 +1061,17 @@ def security_audit_endpoint():
         
         # Return the results as JSON
         return jsonify(audit_results)
-    except Exception as e:
-        logger.error(f"Error running security audit: {str(e)}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Error running security audit")
         return jsonify({
             "error": "Error running security audit",
-            "message": str(e),
+            "message": INTERNAL_ERROR_MESSAGE,
             "timestamp": datetime.datetime.utcnow().isoformat()
         }), 500
 
 # Add the trajectories endpoint
 @api_routes.route('/trajectories', methods=['GET'])
-@limiter.limit("60 per minute")
+@sliding_window_limit("60 per minute")
 def get_trajectories_data():
     """
     Get combined train trajectories data with stops, route, and status information
@@ -760,12 +1098,12 @@ def get_trajectories_data():
         if isinstance(response, tuple):
             logger.error(f"Error generating trajectories: {response[0]}")
             return jsonify(response[0]), response[1]
-            
-        return jsonify(response)
-    except Exception as e:
-        logger.error(f"Error in trajectories endpoint: {str(e)}")
-        logger.error(traceback.format_exc())
+        
+        # The orjson provider of the app writes the JSON straight to bytes
+        return current_app.json.response(response)
+    except Exception:
+        logger.exception("Error in trajectories endpoint")
         return jsonify({
-            "error": "Error generating trajectories data", 
-            "message": str(e)
+            "error": "Error generating trajectories data",
+            "message": INTERNAL_ERROR_MESSAGE
         }), 500
\ No newline at end of file
@@ -9,12 +9,16 @@ Security features for the NMBS Train Data API
 import os
 import re
 import json
+import time
+import queue
+import atexit
 import logging
 import datetime
 import functools
 import ipaddress
+import threading
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Callable, Union
+from typing import Dict, List, Any, Optional, Callable, Tuple, Union
 
 from flask import Flask, request, Response, g, abort, redirect, current_app
 from flask_limiter import Limiter
@@ -44,6 +48,9 @@ SECURITY_HEADERS = {
     'Referrer-Policy': 'strict-origin-when-cross-origin'
 }
 
+# Security headers that are left out when a response sets its own Cache-Control
+CACHING_HEADERS = frozenset(('Cache-Control', 'Pragma'))
+
 # List of known safe domains for hostname validation
 SAFE_DOMAINS = [
     'localhost',
@@ -61,14 +68,61 @@ VALIDATION_PATTERNS = {
     'time': re.compile(r'^\d{2}:\d{2}(:\d{2})?$'),
 }
 
+# Parameters that are converted to non-negative integers
+_NUMERIC_PARAMS = frozenset({'page', 'page_size'})
+
+# Translation table that deletes the ASCII control characters
+_CTRL_DELETE = dict.fromkeys(list(range(0, 32)) + [127])
+
+def _remove_non_printable(value: str) -> str:
+    """Remove control characters and other non-printables from a string"""
+    value = value.translate(_CTRL_DELETE)
+    # Only fall back to the per-character filter for non-ASCII non-printables
+    if not value.isprintable():
+        value = ''.join(c for c in value if c.isprintable())
+    return value
+
 # --- Audit Configuration ---
 AUDIT_LOG_DIR = 'logs/security'
+AUDIT_QUEUE_SIZE = 10_000      # Maximum number of entries waiting to be written
+AUDIT_FLUSH_INTERVAL = 1.0     # Seconds between flushes of the audit log
+AUDIT_FLUSH_BATCH = 256        # Flush early once this many entries are written
+AUDIT_BUFFER_SIZE = 64 * 1024  # Write buffer of the audit log file
+
+# Audit entries are written by a background thread so requests never wait on disk I/O
+_audit_queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_audit_writer_thread = None
+_audit_dropped_events = 0
+_AUDIT_STOP = object()
+
+# Formatted "now" strings, refreshed at most once per second
+_NOW_CACHE = {'s': None, 'iso': '', 'date': ''}
+
+def _audit_now() -> tuple:
+    """
+    Get the current UTC ISO timestamp and local date for audit entries
+    
+    Returns:
+        tuple: (ISO timestamp with microseconds, local date as YYYY-MM-DD)
+    """
+    now = time.time()
+    s = int(now)
+    if s != _NOW_CACHE['s']:
+        _NOW_CACHE.update(
+            s=s,
+            iso=time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(s)),
+            date=time.strftime('%Y-%m-%d', time.localtime(s))
+        )
+    return f"{_NOW_CACHE['iso']}.{int((now - s) * 1_000_000):06d}", _NOW_CACHE['date']
 
 # --- Rate Limiter Setup ---
+# Use a shared Redis (e.g. redis://localhost:6379/0) so all workers share the same counters
+RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+
 limiter = Limiter(
     key_func=get_remote_address,
-    default_limits=DEFAULT_RATE_LIMITS["default"],
-    storage_uri="memory://",
+    default_limits=[DEFAULT_RATE_LIMITS["default"]],
+    storage_uri=RATELIMIT_STORAGE_URI,
 )
 
 def setup_security(app: Flask) -> None:
@@ -84,6 +138,9 @@ def setup_security(app: Flask) -> None:
     # Create audit log directory
     os.makedirs(AUDIT_LOG_DIR, exist_ok=True)
     
+    # Start the background audit log writer
+    _start_audit_writer()
+    
     # Configure app
     app.config['PREFERRED_URL_SCHEME'] = 'https'
     
@@ -92,6 +149,104 @@ def setup_security(app: Flask) -> None:
     
     logger.info("Security features initialized")
 
+def validate_input() -> None:
+    """
+    Validate and sanitize request parameters
+    
+    Registered as a before_request hook of the api_routes blueprint only, so
+    /metrics, static files and other app-level routes skip it entirely. Those
+    routes get no g.sanitized_params, get_sanitized_args then returns the raw
+    arguments.
+    """
+    # Keep a reference to the original parameters, they are only copied when logged
+    g.original_params = request.args
+    g.sanitized = False
+    
+    # Most requests (health checks, static files) carry no parameters at all
+    if not request.args:
+        g.sanitized_params = {}
+        g.sanitized = True
+        return
+    
+    sanitized_args, validation_errors = sanitize_params(request.args)
+    
+    # Store sanitized parameters
+    g.sanitized_params = sanitized_args
+    g.sanitized = True
+    
+    # If validation failed, log and abort
+    if validation_errors:
+        log_security_event('input_validation_failure', {
+            'errors': validation_errors,
+            'path': request.path
+        })
+        abort(400, description="Invalid request parameters")
+
+def sanitize_params(params) -> Tuple[Dict[str, Any], List[Dict[str, str]]]:
+    """
+    Validate and sanitize query parameters
+    
+    Used by validate_input for the query string, and for the queries in the
+    body of the planning batch endpoint.
+    
+    Args:
+        params: Mapping of parameter names to their string values
+        
+    Returns:
+        tuple: (sanitized parameters, list of validation errors)
+    """
+    sanitized_args = {}
+    validation_errors = []
+    
+    for param_name, param_value in params.items():
+        # Skip empty parameters
+        if not param_value:
+            continue
+            
+        # Apply pattern validation if applicable
+        pattern = VALIDATION_PATTERNS.get(param_name)
+        if pattern is not None:
+            match = pattern.match(param_value)
+            if not match:
+                validation_errors.append({
+                    'param': param_name,
+                    'value': param_value,
+                    'reason': 'Invalid format'
+                })
+                continue
+            # The patterns only allow printable ASCII, so a value matched in full
+            # (no trailing newline accepted by '$') needs no sanitizing
+            if param_name not in _NUMERIC_PARAMS and match.end() == len(param_value):
+                sanitized_args[param_name] = param_value
+                continue
+        
+        # Additional parameter-specific validation
+        if param_name in _NUMERIC_PARAMS:
+            try:
+                value = int(param_value)
+                if value < 0 or (param_name == 'page_size' and value > 1000):
+                    validation_errors.append({
+                        'param': param_name,
+                        'value': param_value,
+                        'reason': 'Value out of allowed range'
+                    })
+                    continue
+                sanitized_args[param_name] = value
+            except ValueError:
+                validation_errors.append({
+                    'param': param_name,
+                    'value': param_value,
+                    'reason': 'Not a valid number'
+                })
+                continue
+        else:
+            # Basic sanitization for string parameters
+            sanitized_value = param_value.strip()
+            # Remove control characters and ensure we're dealing with valid strings
+            sanitized_args[param_name] = _remove_non_printable(sanitized_value)
+    
+    return sanitized_args, validation_errors
+
 def _register_security_middleware(app: Flask) -> None:
     """Register all security middleware with the Flask app"""
     
@@ -108,78 +263,14 @@ def _register_security_middleware(app: Flask) -> None:
     #         url = request.url.replace('http://', 'https://', 1)
     #         return redirect(url, code=301)  # Permanent redirect
     
-    @app.before_request
-    def validate_input():
-        """Validate and sanitize request parameters"""
-        # Store original parameters for logging purposes
-        g.original_params = dict(request.args)
-        g.sanitized = False
-        
-        # Check all request parameters
-        sanitized_args = {}
-        has_validation_error = False
-        validation_errors = []
-        
-        for param_name, param_value in request.args.items():
-            # Skip empty parameters
-            if not param_value:
-                continue
-                
-            # Apply pattern validation if applicable
-            if param_name in VALIDATION_PATTERNS:
-                if not VALIDATION_PATTERNS[param_name].match(str(param_value)):
-                    has_validation_error = True
-                    validation_errors.append({
-                        'param': param_name,
-                        'value': param_value,
-                        'reason': 'Invalid format'
-                    })
-                    continue
-            
-            # Additional parameter-specific validation
-            if param_name == 'page' or param_name == 'page_size':
-                try:
-                    value = int(param_value)
-                    if value < 0 or (param_name == 'page_size' and value > 1000):
-                        has_validation_error = True
-                        validation_errors.append({
-                            'param': param_name,
-                            'value': param_value,
-                            'reason': 'Value out of allowed range'
-                        })
-                        continue
-                    sanitized_args[param_name] = value
-                except ValueError:
-                    has_validation_error = True
-                    validation_errors.append({
-                        'param': param_name,
-                        'value': param_value,
-                        'reason': 'Not a valid number'
-                    })
-                    continue
-            else:
-                # Basic sanitization for string parameters
-                sanitized_value = str(param_value).strip()
-                # Remove control characters and ensure we're dealing with valid strings
-                sanitized_value = ''.join(c for c in sanitized_value if c.isprintable())
-                sanitized_args[param_name] = sanitized_value
-        
-        # Store sanitized parameters
-        g.sanitized_params = sanitized_args
-        g.sanitized = True
-        
-        # If validation failed, log and abort
-        if has_validation_error:
-            log_security_event('input_validation_failure', {
-                'errors': validation_errors,
-                'path': request.path
-            })
-            abort(400, description="Invalid request parameters")
-    
     @app.after_request
     def add_security_headers(response: Response) -> Response:
         """Add security headers to all responses"""
+        # Responses that are meant to be cached set their own Cache-Control
+        cacheable = 'Cache-Control' in response.headers
         for header, value in SECURITY_HEADERS.items():
+            if cacheable and header in CACHING_HEADERS:
+                continue
             response.headers[header] = value
             
         return response
@@ -203,7 +294,7 @@ def _register_security_middleware(app: Flask) -> None:
         
         # Add request parameters if available
         if hasattr(g, 'original_params'):
-            log_data['parameters'] = g.original_params
+            log_data['parameters'] = dict(g.original_params)
             
         # Log to audit file
         log_security_event('api_request', log_data)
@@ -224,32 +315,111 @@ def _register_security_middleware(app: Flask) -> None:
             'message': 'You have exceeded the rate limit. Please try again later.'
         }, 429
 
+def _start_audit_writer() -> threading.Thread:
+    """Start the background thread that writes queued audit entries to disk"""
+    global _audit_writer_thread
+    if _audit_writer_thread is None or not _audit_writer_thread.is_alive():
+        _audit_writer_thread = threading.Thread(target=_audit_writer_loop, daemon=True)
+        _audit_writer_thread.start()
+        atexit.register(_stop_audit_writer)
+        logger.info("Started security audit writer thread")
+    return _audit_writer_thread
+
+def _stop_audit_writer() -> None:
+    """Write the remaining queued audit entries to disk when the process exits"""
+    if _audit_writer_thread is not None and _audit_writer_thread.is_alive():
+        # Tell the writer to flush, close the file and stop
+        try:
+            _audit_queue.put((None, _AUDIT_STOP), timeout=5)
+        except queue.Full:
+            return
+        _audit_writer_thread.join(timeout=5)
+
+def _audit_writer_loop() -> None:
+    """
+    Drain the audit queue into the dated log file
+    
+    The file handle stays open and is only flushed every AUDIT_FLUSH_INTERVAL
+    seconds or AUDIT_FLUSH_BATCH entries. It is reopened when the date changes.
+    """
+    log_handle = None
+    current_day = None
+    pending = 0
+    last_flush = time.monotonic()
+    
+    while True:
+        try:
+            day, line = _audit_queue.get(timeout=AUDIT_FLUSH_INTERVAL)
+        except queue.Empty:
+            day, line = None, None
+        
+        # Stop requested by _stop_audit_writer
+        if line is _AUDIT_STOP:
+            if log_handle:
+                log_handle.close()
+            return
+        
+        try:
+            if line is not None:
+                # Rotate to a new file when the date changes
+                if day != current_day:
+                    if log_handle:
+                        log_handle.close()
+                    log_file = os.path.join(AUDIT_LOG_DIR, f'security-audit-{day}.log')
+                    log_handle = open(log_file, 'a', buffering=AUDIT_BUFFER_SIZE)
+                    current_day = day
+                
+                log_handle.write(line)
+                pending += 1
+            
+            if pending and (pending >= AUDIT_FLUSH_BATCH or
+                            time.monotonic() - last_flush >= AUDIT_FLUSH_INTERVAL):
+                log_handle.flush()
+                pending = 0
+                last_flush = time.monotonic()
+        except Exception as e:
+            logger.error("Failed to write security audit log: %s", e)
+            # Close the file, which also tries to write its buffered entries,
+            # and reopen it on the next entry
+            if log_handle:
+                try:
+                    log_handle.close()
+                except Exception as close_error:
+                    logger.error("Failed to close security audit log: %s", close_error)
+            log_handle = None
+            current_day = None
+            pending = 0
+
 def log_security_event(event_type: str, data: dict) -> None:
     """
     Log a security event to the audit log
     
+    The entry is queued and written by the background audit writer. When the
+    queue is full the entry is dropped and counted instead of blocking the request.
+    
     Args:
         event_type: Type of security event
         data: Event details
     """
+    global _audit_dropped_events
     try:
         # Create dated log file
-        today = datetime.datetime.now().strftime('%Y-%m-%d')
-        log_file = os.path.join(AUDIT_LOG_DIR, f'security-audit-{today}.log')
+        timestamp, today = _audit_now()
         
         # Prepare log entry
         entry = {
-            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'timestamp': timestamp,
             'event_type': event_type,
             'data': data
         }
         
-        # Write to log file
-        with open(log_file, 'a') as f:
-            f.write(json.dumps(entry) + '\n')
-            
+        # Hand the entry to the writer thread
+        _audit_queue.put_nowait((today, json.dumps(entry) + '\n'))
+        
+    except queue.Full:
+        _audit_dropped_events += 1
     except Exception as e:
-        logger.error(f"Failed to log security event: {str(e)}")
+        logger.error("Failed to log security event: %s", e)
 
 def validate_param(param: str, pattern_name: str) -> bool:
     """
@@ -283,14 +453,14 @@ def sanitize_param(param: str) -> str:
     result = str(param).strip()
     
     # Remove control characters and non-printables
-    result = ''.join(c for c in result if c.isprintable())
-    
-    return result
+    return _remove_non_printable(result)
 
 def get_sanitized_args() -> Dict[str, Any]:
     """
     Get sanitized request arguments if available
     
+    Only endpoints of the api_routes blueprint are validated, see validate_input.
+    
     Returns:
         Dict: The sanitized arguments or original args if sanitization hasn't run
     """
@@ -347,6 +517,8 @@ def run_security_audit() -> Dict[str, Any]:
         'details': {
             'log_dir': AUDIT_LOG_DIR,
             'log_files': len(log_files),
+            'queued_events': _audit_queue.qsize(),
+            'dropped_events': _audit_dropped_events,
         }
     })
     
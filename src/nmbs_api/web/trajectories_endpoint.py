@@ -4,11 +4,15 @@ This module provides direct file access to generate train trajectory data
 with combined information from multiple data sources.
 """
 
-import json
 import logging
 import os
 import csv
 import datetime
+import functools
+import itertools
+import orjson
+import numpy as np
+import pandas as pd
 from pathlib import Path
 
 # Import pagination settings
@@ -28,55 +32,103 @@ CACHE_DIR = BASE_DIR / 'data' / 'cache'
 EXTRACTED_DIR = BASE_DIR / 'data' / 'Planning_gegevens' / 'extracted'
 REALTIME_DIR = BASE_DIR / 'data' / 'Real-time_gegevens'
 
-logger.info(f"Base directory: {BASE_DIR}")
-logger.info(f"Cache directory: {CACHE_DIR}")
-logger.info(f"Extracted directory: {EXTRACTED_DIR}")
-logger.info(f"Realtime directory: {REALTIME_DIR}")
+logger.info("Base directory: %s", BASE_DIR)
+logger.info("Cache directory: %s", CACHE_DIR)
+logger.info("Extracted directory: %s", EXTRACTED_DIR)
+logger.info("Realtime directory: %s", REALTIME_DIR)
+
+# The data directories are checked once at import, requests just try to open the files
+_DIRS_EXIST = {
+    'cache': CACHE_DIR.is_dir(),
+    'extracted': EXTRACTED_DIR.is_dir(),
+    'realtime': REALTIME_DIR.is_dir()
+}
+logger.info("Data directories found: %s", _DIRS_EXIST)
+
+# Keep the full trajectories list in memory between requests. Disable on
+# memory-constrained deployments to build only the requested page instead.
+CACHE_TRAJECTORIES = os.getenv('TRAJECTORIES_CACHE', 'true').lower() == 'true'
+
+@functools.lru_cache(maxsize=4096)
+def _format_unix_time(ts):
+    """Format a Unix timestamp in seconds; many stops share the same timestamps"""
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S (%A)")
 
 def format_timestamp(timestamp):
     """Convert Unix timestamp to human-readable format"""
-    if timestamp and str(timestamp).isdigit():
-        dt = datetime.datetime.fromtimestamp(int(timestamp))
-        return dt.strftime("%Y-%m-%d %H:%M:%S (%A)")
+    if not timestamp:
+        return "Not available"
+    if str(timestamp).isdigit():
+        return _format_unix_time(int(timestamp))
     return "Not available"
 
+# Parsed files by path: {path: (mtime_ns, size, data)}. Only the latest version
+# of a file is kept, a rewritten file replaces the entry of its previous version.
+_parsed_files = {}
+
+def _load_cached(file_path, parse):
+    """
+    Parse a file from disk, reusing the result while the file is unchanged
+    
+    The file is only parsed again once its modification time or size changed.
+    The returned object is shared between callers and must not be modified.
+    """
+    st = file_path.stat()
+    path_str = str(file_path)
+    cached = _parsed_files.get(path_str)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    
+    data = parse(path_str)
+    _parsed_files[path_str] = (st.st_mtime_ns, st.st_size, data)
+    return data
+
+def _parse_json(path_str):
+    """Parse a JSON file"""
+    with open(path_str, 'rb') as f:
+        return orjson.loads(f.read())
+
+def _load_json_file(file_path):
+    """Load a JSON file, reusing the parsed result while the file is unchanged"""
+    return _load_cached(file_path, _parse_json)
+
 def load_cache_file(filename):
     """Load a cache file directly from the filesystem"""
     try:
         file_path = CACHE_DIR / filename
-        logger.info(f"Looking for cache file at: {file_path}")
-        
-        if file_path.exists():
-            logger.info(f"Found cache file: {filename}")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            logger.warning(f"Cache file not found: {filename}")
-            return None
+        logger.info("Looking for cache file at: %s", file_path)
+        return _load_json_file(file_path)
+    except FileNotFoundError:
+        logger.warning("Cache file not found: %s", filename)
+        return None
     except Exception as e:
-        logger.error(f"Error loading cache file {filename}: {e}")
+        logger.error("Error loading cache file %s: %s", filename, e)
         return None
 
+def _parse_csv(path_str):
+    """Parse a CSV file into a list of rows"""
+    data = []
+    with open(path_str, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            data.append(row)
+    return data
+
 def load_csv_data(filename):
     """Load data from a CSV file in the extracted directory"""
     try:
         file_path = EXTRACTED_DIR / filename
-        logger.info(f"Looking for data file at: {file_path}")
-        
-        if not file_path.exists():
-            logger.error(f"Data file not found: {filename}")
-            return None
+        logger.info("Looking for data file at: %s", file_path)
         
-        data = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                data.append(row)
+        data = _load_cached(file_path, _parse_csv)
         
-        logger.info(f"Successfully loaded {len(data)} records from {filename}")
+        logger.info("Successfully loaded %s records from %s", len(data), filename)
         return data
+    except FileNotFoundError:
+        logger.error("Data file not found: %s", filename)
+        return None
     except Exception as e:
-        logger.error(f"Error loading data file {filename}: {e}")
+        logger.error("Error loading data file %s: %s", filename, e)
         return None
 
 def load_realtime_data():
@@ -91,19 +143,333 @@ def load_realtime_data():
         
         for filename in possible_files:
             file_path = REALTIME_DIR / filename
-            logger.info(f"Looking for realtime data at: {file_path}")
+            logger.info("Looking for realtime data at: %s", file_path)
             
-            if file_path.exists():
-                logger.info(f"Found realtime data file: {filename}")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            try:
+                return _load_json_file(file_path)
+            except FileNotFoundError:
+                continue
         
         logger.error("No realtime data file found after checking all possible names")
         return None
     except Exception as e:
-        logger.error(f"Error loading realtime data: {e}")
+        logger.error("Error loading realtime data: %s", e)
         return None
 
+# Trajectories built from the last seen source data, reused while the sources are unchanged
+_trajectories_cache = (None, None)
+
+_translations_cache = (None, {})
+
+def _get_translations_lookup(translations_data):
+    """
+    Get the stop name translations as {stop_name: {language: translation}}
+    
+    The lookup is only rebuilt when the loaders return a new translations object.
+    The returned dictionary is shared between requests and must not be modified.
+    """
+    global _translations_cache
+    cached_source, cached_lookup = _translations_cache
+    if translations_data is cached_source:
+        return cached_lookup
+    
+    translations_lookup = {}
+    if translations_data:
+        for item in translations_data:
+            if item.get('table_name') == 'stops' and item.get('field_name') == 'stop_name':
+                field_value = item.get('field_value')
+                language = item.get('language')
+                translation = item.get('translation')
+                
+                if field_value and language and translation:
+                    if field_value not in translations_lookup:
+                        translations_lookup[field_value] = {}
+                    translations_lookup[field_value][language] = translation
+    
+    _translations_cache = (translations_data, translations_lookup)
+    return translations_lookup
+
+def _build_lookups(stops_data, trips_data, routes_data, translations_data):
+    """
+    Create the lookup dictionaries used to enrich realtime entities
+    
+    Returns:
+        tuple: (stops_lookup, trips_lookup, routes_lookup, translations_lookup)
+    """
+    # Create a lookup dictionary for faster access
+    stops_lookup = {stop.get('stop_id'): stop for stop in stops_data}
+    trips_lookup = {trip.get('trip_id'): trip for trip in trips_data}
+    routes_lookup = {route.get('route_id'): route for route in routes_data}
+    
+    translations_lookup = _get_translations_lookup(translations_data)
+    
+    return stops_lookup, trips_lookup, routes_lookup, translations_lookup
+
+def _has_stops(entity):
+    """Check if a realtime entity produces a trajectory with at least one stop"""
+    # Skip entities without trip updates
+    trip_update = entity.get('tripUpdate')
+    if not trip_update or 'trip' not in trip_update:
+        return False
+    
+    if not trip_update['trip'].get('tripId'):
+        return False
+    
+    return any('stopId' in stop_update for stop_update in trip_update.get('stopTimeUpdate', ()))
+
+def _qualifying_entities(realtime_data):
+    """Iterate over the realtime entities that produce a trajectory"""
+    return filter(_has_stops, realtime_data.get('entity', ()))
+
+def _format_delay_status(delay_minutes):
+    """Describe a delay in minutes as a status text"""
+    if delay_minutes == 0:
+        return "on time"
+    if delay_minutes > 0:
+        return f"delayed by {delay_minutes} min"
+    return f"early by {abs(delay_minutes)} min"
+
+# Precomputed status texts for the common delays, from 10 minutes early to an hour late
+_STATUS_CACHE = {d: _format_delay_status(d) for d in range(-10, 61)}
+
+def _delay_status(delay_minutes):
+    """Describe a delay in minutes as a status text, using the precomputed texts when possible"""
+    status = _STATUS_CACHE.get(delay_minutes)
+    if status is None:
+        status = _format_delay_status(delay_minutes)
+    return status
+
+def _new_trajectory(entity, trips_lookup, routes_lookup):
+    """Create the trajectory object for a realtime entity, without its stops"""
+    entity_id = entity.get('id', 'unknown')
+    trip_id = entity['tripUpdate']['trip'].get('tripId')
+    
+    # Get associated trip and route data
+    trip_data = trips_lookup.get(trip_id)
+    route_id = trip_data.get('route_id') if trip_data else None
+    route_data = routes_lookup.get(route_id) if route_id else None
+    
+    return {
+        "entity_id": entity_id,
+        "trip_id": trip_id,
+        "route": {
+            "route_id": route_id,
+            "route_type": route_data.get("route_short_name") if route_data else None,
+            "route_name": route_data.get("route_long_name") if route_data else "Unknown Route",
+            "agency_id": route_data.get("agency_id") if route_data else None
+        },
+        "trip": {
+            "trip_number": trip_data.get("trip_short_name") if trip_data else None,
+            "trip_headsign": trip_data.get("trip_headsign") if trip_data else None,
+            "service_id": trip_data.get("service_id") if trip_data else None
+        },
+        "stops": []
+    }
+
+def _format_stop(stop_id, station_data, translations_lookup, arrival, departure):
+    """
+    Format the information of a single stop
+    
+    Args:
+        stop_id (str): Stop ID from the realtime data, including the platform
+        station_data (dict): Station from stops data, or None if unknown
+        translations_lookup (dict): Translations of the station names
+        arrival (dict): Formatted arrival information, or None
+        departure (dict): Formatted departure information, or None
+    """
+    # Get translations
+    translations = {}
+    if station_data and 'stop_name' in station_data:
+        stop_name = station_data['stop_name']
+        translations = translations_lookup.get(stop_name, {})
+    
+    return {
+        "stop_id": stop_id,
+        "station": {
+            "name": station_data.get("stop_name") if station_data else "Unknown Station",
+            "location": {
+                "latitude": station_data.get("stop_lat") if station_data else None,
+                "longitude": station_data.get("stop_lon") if station_data else None
+            },
+            "translations": translations
+        },
+        "arrival": arrival,
+        "departure": departure
+    }
+
+def _format_stop_time(timestamp, formatted, delay_seconds, delay_minutes, status):
+    """Format arrival or departure information, None if there is no timestamp"""
+    if not timestamp:
+        return None
+    return {
+        "timestamp": timestamp,
+        "datetime": formatted,
+        "delay_seconds": delay_seconds,
+        "delay_minutes": delay_minutes,
+        "status": status
+    }
+
+def _stop_time_values(event):
+    """Get the timestamp and delay in seconds of an arrival or departure"""
+    if not event:
+        return None, 0
+    return event.get('time'), int(event.get('delay', 0))
+
+@functools.lru_cache(maxsize=4096)
+def _base_stop_id(stop_id):
+    """Strip the platform suffix from a stop id; the same stations repeat across entities"""
+    return stop_id.partition('_')[0]
+
+def _build_trajectory(entity, lookups):
+    """
+    Create the trajectory object for a single realtime entity
+    
+    Args:
+        entity (dict): A realtime entity accepted by _has_stops
+        lookups (tuple): The lookup dictionaries from _build_lookups
+        
+    Returns:
+        dict: The trajectory with route, trip and stop information
+    """
+    stops_lookup, trips_lookup, routes_lookup, translations_lookup = lookups
+    trajectory = _new_trajectory(entity, trips_lookup, routes_lookup)
+    
+    # Add stops information
+    for stop_update in entity['tripUpdate']['stopTimeUpdate']:
+        if 'stopId' not in stop_update:
+            continue
+            
+        stop_id = stop_update['stopId']
+        base_stop_id = _base_stop_id(stop_id)  # Remove platform number
+        
+        # Process arrival and departure information
+        stop_times = []
+        for event in (stop_update.get('arrival', {}), stop_update.get('departure', {})):
+            timestamp, delay = _stop_time_values(event)
+            delay_min = delay // 60
+            stop_times.append(_format_stop_time(
+                timestamp, format_timestamp(timestamp), delay, delay_min, _delay_status(delay_min)
+            ))
+        
+        trajectory["stops"].append(_format_stop(
+            stop_id, stops_lookup.get(base_stop_id), translations_lookup, *stop_times
+        ))
+    
+    return trajectory
+
+def _format_per_value(values, format_value):
+    """
+    Format a column by formatting each distinct value only once
+    
+    Args:
+        values (list): The column values
+        format_value (callable): Formats a single value
+        
+    Returns:
+        list: The formatted value of every row
+    """
+    codes, uniques = pd.factorize(np.array(values, dtype=object), use_na_sentinel=False)
+    return np.array([format_value(value) for value in uniques], dtype=object)[codes].tolist()
+
+def _stop_time_columns(events):
+    """
+    Compute the arrival or departure information of all stops column-wise
+    
+    Returns:
+        tuple: Lists of the timestamps, datetimes, delays in seconds, delays in
+            minutes and status texts
+    """
+    timestamps = [event.get('time') if event else None for event in events]
+    delays = np.array([int(event.get('delay', 0)) if event else 0 for event in events], dtype=np.int64)
+    delay_minutes = delays // 60
+    return (
+        timestamps,
+        _format_per_value(timestamps, format_timestamp),
+        delays.tolist(),
+        delay_minutes.tolist(),
+        _format_per_value(delay_minutes, _delay_status)
+    )
+
+def _build_trajectories(realtime_data, stops_data, trips_data, routes_data, translations_data):
+    """
+    Combine realtime trip updates with the static planning data
+    
+    The stop updates of all entities are flattened into columns. The station
+    join, the delays in minutes, the status texts and the datetimes are computed
+    per column, each distinct value only once, so per stop only the finished
+    values are put into the stop object. Stops at the same station share one
+    station object, the list is not modified once it is built.
+    
+    Returns:
+        list: All trajectories that have at least one stop, equal to what
+            _build_trajectory gives for each entity
+    """
+    stops_lookup, trips_lookup, routes_lookup, translations_lookup = _build_lookups(
+        stops_data, trips_data, routes_data, translations_data
+    )
+    
+    entities = list(_qualifying_entities(realtime_data))
+    trajectories = [_new_trajectory(entity, trips_lookup, routes_lookup) for entity in entities]
+    
+    # Flatten the stop updates, one row per stop
+    stop_lists = []
+    stop_updates = []
+    for trajectory, entity in zip(trajectories, entities):
+        for stop_update in entity['tripUpdate']['stopTimeUpdate']:
+            if 'stopId' in stop_update:
+                stop_lists.append(trajectory["stops"])
+                stop_updates.append(stop_update)
+    stop_ids = [stop_update['stopId'] for stop_update in stop_updates]
+    
+    # Join the stations on the stop ID without platform number
+    stations = _format_per_value(stop_ids, lambda stop_id: _format_stop(
+        stop_id, stops_lookup.get(_base_stop_id(stop_id)), translations_lookup, None, None
+    )["station"])
+    arrivals = _stop_time_columns([stop_update.get('arrival') for stop_update in stop_updates])
+    departures = _stop_time_columns([stop_update.get('departure') for stop_update in stop_updates])
+    
+    for (stops, stop_id, station,
+         arrival_time, arrival_datetime, arrival_delay, arrival_delay_min, arrival_status,
+         departure_time, departure_datetime, departure_delay, departure_delay_min, departure_status) in zip(
+            stop_lists, stop_ids, stations, *arrivals, *departures):
+        stops.append({
+            "stop_id": stop_id,
+            "station": station,
+            "arrival": {
+                "timestamp": arrival_time,
+                "datetime": arrival_datetime,
+                "delay_seconds": arrival_delay,
+                "delay_minutes": arrival_delay_min,
+                "status": arrival_status
+            } if arrival_time else None,
+            "departure": {
+                "timestamp": departure_time,
+                "datetime": departure_datetime,
+                "delay_seconds": departure_delay,
+                "delay_minutes": departure_delay_min,
+                "status": departure_status
+            } if departure_time else None
+        })
+    
+    return trajectories
+
+def _get_combined_data(realtime_data, stops_data, trips_data, routes_data, translations_data):
+    """
+    Get the full trajectories list, rebuilding it only when the source data changed
+    
+    The loaders return the same objects for as long as the underlying files are
+    unchanged, so an identity check is enough to detect a new data version.
+    """
+    global _trajectories_cache
+    sources = (realtime_data, stops_data, trips_data, routes_data, translations_data)
+    cached_sources, cached_data = _trajectories_cache
+    if cached_sources is not None and all(a is b for a, b in zip(cached_sources, sources)):
+        return cached_data
+    
+    combined_data = _build_trajectories(*sources)
+    _trajectories_cache = (sources, combined_data)
+    return combined_data
+
 def get_trajectories(page=0, page_size=None):
     """
     Get train trajectories data directly from data files
@@ -128,15 +494,12 @@ def get_trajectories(page=0, page_size=None):
         # Limit page_size to max_size
         page_size = min(page_size, max_size)
         
-        logger.info(f"Generating trajectories data (page={page}, page_size={page_size})")
-        logger.info(f"CACHE_DIR exists: {CACHE_DIR.exists()}")
-        logger.info(f"EXTRACTED_DIR exists: {EXTRACTED_DIR.exists()}")
-        logger.info(f"REALTIME_DIR exists: {REALTIME_DIR.exists()}")
+        logger.info("Generating trajectories data (page=%s, page_size=%s)", page, page_size)
         
         # List all files in the cache directory to help diagnose issues
-        if CACHE_DIR.exists():
+        if logger.isEnabledFor(logging.DEBUG):
             cache_files = list(CACHE_DIR.glob("*_cache.json"))
-            logger.info(f"Cache directory contains {len(cache_files)} cache files: {[f.name for f in cache_files]}")
+            logger.debug("Cache directory contains %s cache files: %s", len(cache_files), [f.name for f in cache_files])
         
         # First try to load from cache files
         realtime_data = load_cache_file('realtime_cache.json')
@@ -171,140 +534,28 @@ def get_trajectories(page=0, page_size=None):
             logger.error("Routes data not available")
             return {"error": "Routes data not available"}, 500
         
-        # Process the data to create trajectories
-        combined_data = []
-        
-        # Create a lookup dictionary for faster access
-        stops_lookup = {stop.get('stop_id'): stop for stop in stops_data}
-        trips_lookup = {trip.get('trip_id'): trip for trip in trips_data}
-        routes_lookup = {route.get('route_id'): route for route in routes_data}
-        
-        # Create translations lookup
-        translations_lookup = {}
-        if translations_data:
-            for item in translations_data:
-                if item.get('table_name') == 'stops' and item.get('field_name') == 'stop_name':
-                    field_value = item.get('field_value')
-                    language = item.get('language')
-                    translation = item.get('translation')
-                    
-                    if field_value and language and translation:
-                        if field_value not in translations_lookup:
-                            translations_lookup[field_value] = {}
-                        translations_lookup[field_value][language] = translation
+        start_idx = page * page_size
         
-        # Process each entity in the realtime data
-        if 'entity' in realtime_data:
-            for entity in realtime_data['entity']:
-                entity_id = entity.get('id', 'unknown')
-                
-                # Skip entities without trip updates
-                if 'tripUpdate' not in entity or 'trip' not in entity['tripUpdate']:
-                    continue
-                    
-                trip_id = entity['tripUpdate']['trip'].get('tripId')
-                if not trip_id:
-                    continue
-                    
-                # Get associated trip and route data
-                trip_data = trips_lookup.get(trip_id)
-                route_id = trip_data.get('route_id') if trip_data else None
-                route_data = routes_lookup.get(route_id) if route_id else None
-                
-                # Create trajectory object
-                trajectory = {
-                    "entity_id": entity_id,
-                    "trip_id": trip_id,
-                    "route": {
-                        "route_id": route_id,
-                        "route_type": route_data.get("route_short_name") if route_data else None,
-                        "route_name": route_data.get("route_long_name") if route_data else "Unknown Route",
-                        "agency_id": route_data.get("agency_id") if route_data else None
-                    },
-                    "trip": {
-                        "trip_number": trip_data.get("trip_short_name") if trip_data else None,
-                        "trip_headsign": trip_data.get("trip_headsign") if trip_data else None,
-                        "service_id": trip_data.get("service_id") if trip_data else None
-                    },
-                    "stops": []
-                }
-                
-                # Add stops information
-                if 'tripUpdate' in entity and 'stopTimeUpdate' in entity['tripUpdate']:
-                    for stop_update in entity['tripUpdate']['stopTimeUpdate']:
-                        if 'stopId' not in stop_update:
-                            continue
-                            
-                        stop_id = stop_update['stopId']
-                        base_stop_id = stop_id.split('_')[0]  # Remove platform number
-                        
-                        # Get station data
-                        station_data = stops_lookup.get(base_stop_id)
-                        
-                        # Get translations
-                        translations = {}
-                        if station_data and 'stop_name' in station_data:
-                            stop_name = station_data['stop_name']
-                            translations = translations_lookup.get(stop_name, {})
-                        
-                        # Process arrival and departure information
-                        arrival = stop_update.get('arrival', {})
-                        departure = stop_update.get('departure', {})
-                        
-                        arrival_time = arrival.get('time') if arrival else None
-                        arrival_delay = int(arrival.get('delay', 0)) if arrival else 0
-                        arrival_delay_min = arrival_delay // 60 if arrival_delay else 0
-                        
-                        departure_time = departure.get('time') if departure else None
-                        departure_delay = int(departure.get('delay', 0)) if departure else 0
-                        departure_delay_min = departure_delay // 60 if departure_delay else 0
-                        
-                        # Format stop information
-                        stop_info = {
-                            "stop_id": stop_id,
-                            "station": {
-                                "name": station_data.get("stop_name") if station_data else "Unknown Station",
-                                "location": {
-                                    "latitude": station_data.get("stop_lat") if station_data else None,
-                                    "longitude": station_data.get("stop_lon") if station_data else None
-                                },
-                                "translations": translations
-                            },
-                            "arrival": {
-                                "timestamp": arrival_time,
-                                "datetime": format_timestamp(arrival_time),
-                                "delay_seconds": arrival_delay,
-                                "delay_minutes": arrival_delay_min,
-                                "status": "on time" if arrival_delay_min == 0 else 
-                                         f"delayed by {arrival_delay_min} min" if arrival_delay_min > 0 else
-                                         f"early by {abs(arrival_delay_min)} min"
-                            } if arrival_time else None,
-                            "departure": {
-                                "timestamp": departure_time,
-                                "datetime": format_timestamp(departure_time),
-                                "delay_seconds": departure_delay,
-                                "delay_minutes": departure_delay_min,
-                                "status": "on time" if departure_delay_min == 0 else 
-                                        f"delayed by {departure_delay_min} min" if departure_delay_min > 0 else
-                                        f"early by {abs(departure_delay_min)} min"
-                            } if departure_time else None
-                        }
-                        
-                        trajectory["stops"].append(stop_info)
-                
-                # Only add trajectories with stops
-                if trajectory["stops"]:
-                    combined_data.append(trajectory)
+        if CACHE_TRAJECTORIES:
+            # Process the data to create trajectories
+            combined_data = _get_combined_data(
+                realtime_data, stops_data, trips_data, routes_data, translations_data
+            )
+            total_records = len(combined_data)
+            end_idx = min(start_idx + page_size, total_records)
+            paginated_data = combined_data[start_idx:end_idx]
+        else:
+            # Count all trajectories, but only build the ones on the requested page
+            total_records = sum(1 for _ in _qualifying_entities(realtime_data))
+            end_idx = min(start_idx + page_size, total_records)
+            lookups = _build_lookups(stops_data, trips_data, routes_data, translations_data)
+            paginated_data = [
+                _build_trajectory(entity, lookups)
+                for entity in itertools.islice(_qualifying_entities(realtime_data), start_idx, end_idx)
+            ]
         
-        # Apply pagination
-        total_records = len(combined_data)
         total_pages = (total_records + page_size - 1) // page_size if page_size > 0 else 1
         
-        start_idx = page * page_size
-        end_idx = min(start_idx + page_size, total_records)
-        
-        paginated_data = combined_data[start_idx:end_idx]
-        
         # Create response with metadata
         response = {
             "metadata": {
@@ -322,11 +573,9 @@ def get_trajectories(page=0, page_size=None):
             "data": paginated_data
         }
         
-        logger.info(f"Generated trajectories response with {len(paginated_data)} records")
+        logger.info("Generated trajectories response with %s records", len(paginated_data))
         return response
         
-    except Exception as e:
-        logger.error(f"Error generating trajectories: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return {"error": str(e)}, 500
\ No newline at end of file
+    except Exception:
+        logger.exception("Error generating trajectories")
+        return {"error": "Error generating trajectories data"}, 500
\ No newline at end of file
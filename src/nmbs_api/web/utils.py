@@ -56,56 +56,48 @@ GTFS_FIELD_MAPPINGS = {
     'translation': str
 }
 
-def extract_request_params():
+# Field names used to pick the filter parameters out of the query string
+GTFS_FIELDS = frozenset(GTFS_FIELD_MAPPINGS)
+
+def extract_request_params(args=None):
     """
     Extract and validate request parameters for data endpoints
     using a dynamic approach that reduces code duplication.
     
+    Args:
+        args (MultiDict): Parameters to use instead of the query string (optional)
+    
     Returns:
         dict: A dictionary with validated parameters
     """
-    # Get pagination parameters with validation
-    try:
-        page = int(request.args.get('page', 0))
-        if page < 0:
-            page = 0
-    except ValueError:
-        page = 0
-        
-    try:
-        page_size = int(request.args.get('limit', 1000))
-        # Limit page size to reasonable value (between 1 and 5000)
-        if page_size < 1:
-            page_size = 1
-        elif page_size > 5000:
-            page_size = 5000
-    except ValueError:
-        page_size = 1000
+    # Get all query parameters, read once into a local
+    if args is None:
+        args = request.args
+    
+    # Get pagination parameters with validation, invalid numbers fall back to the default
+    page = max(0, args.get('page', 0, type=int))
     
-    # Get all query parameters as a dictionary
-    all_params = request.args.to_dict()
+    # Limit page size to reasonable value (between 1 and 5000)
+    page_size = min(5000, max(1, args.get('limit', 1000, type=int)))
     
     # Extract search parameters dynamically
-    search_query = all_params.get('search')
-    search_field = all_params.get('field')
+    search_query = args.get('search')
+    search_field = args.get('field')
     
     # Handle the search=field_name&field_name=value pattern
     if search_query and not search_field:
         search_field = search_query
         # Check if the field exists in the request and use its value as the search query
-        if search_field in all_params:
-            search_query = all_params.get(search_field)
+        if search_field in args:
+            search_query = args.get(search_field)
             logger.debug(f"Using search format: search={search_field}&{search_field}={search_query}")
     
     # Extract all filter parameters dynamically based on GTFS field mappings
-    filters = {}
-    for field, field_type in GTFS_FIELD_MAPPINGS.items():
-        if field in all_params:
-            filters[field] = all_params.get(field)
+    filters = {field: args[field] for field in GTFS_FIELDS & args.keys()}
     
     # Sort parameters
-    sort_by = all_params.get('sort_by')
-    sort_direction = all_params.get('sort_direction', 'asc').lower()
+    sort_by = args.get('sort_by')
+    sort_direction = args.get('sort_direction', 'asc').lower()
     if sort_direction not in ['asc', 'desc']:
         sort_direction = 'asc'
     
@@ -1,8 +1,10 @@
 """
 JSON Schema validatie voor API verzoeken
 """
-from jsonschema import validate, ValidationError
-from flask import request, jsonify
+import jsonschema_rs
+import msgspec
+from typing import Annotated, Literal, Optional
+from flask import request, jsonify, g
 import functools
 import logging
 
@@ -38,6 +40,59 @@ SCHEMAS = {
     "search": SEARCH_SCHEMA
 }
 
+# Validatiefout van de gecompileerde validators
+ValidationError = jsonschema_rs.ValidationError
+
+# Schema's worden eenmalig bij het importeren in Rust gecompileerd
+VALIDATORS = {name: jsonschema_rs.validator_for(schema) for name, schema in SCHEMAS.items()}
+
+def validate_instance(schema_name, instance):
+    """
+    Valideer data tegen een voorgecompileerd schema
+    
+    Args:
+        schema_name: De naam van het schema om te valideren tegen
+        instance: De data om te valideren
+        
+    Raises:
+        ValidationError: Als de data niet aan het schema voldoet
+    """
+    VALIDATORS[schema_name].validate(instance)
+
+def error_path(error):
+    """
+    Geef het pad naar de ongeldige waarde in de data
+    
+    Args:
+        error: De ValidationError
+        
+    Returns:
+        list: Het pad naar de ongeldige waarde, of None
+    """
+    return list(error.instance_path) or None
+
+# Typed modellen voor query parameters, conversie en validatie in één call
+class UpdateParams(msgspec.Struct):
+    """Query parameters van het update endpoint, zie UPDATE_SCHEMA"""
+    force: bool
+    update_type: Optional[Literal["realtime", "planning", "all"]] = None
+    clear_cache: Optional[bool] = None
+
+class SearchParams(msgspec.Struct):
+    """Query parameters voor zoeken in data, zie SEARCH_SCHEMA"""
+    search: Optional[str] = None
+    field: Optional[str] = None
+    exact: Optional[bool] = None
+    limit: Optional[Annotated[int, msgspec.Meta(ge=1, le=5000)]] = None
+    page: Optional[Annotated[int, msgspec.Meta(ge=0)]] = None
+    sort_by: Optional[str] = None
+    sort_direction: Optional[Literal["asc", "desc"]] = None
+
+PARAM_MODELS = {
+    "update": UpdateParams,
+    "search": SearchParams
+}
+
 def validate_json(schema_name):
     """
     Decorator voor JSON schema validatie in Flask routes
@@ -51,26 +106,27 @@ def validate_json(schema_name):
     def decorator(f):
         @functools.wraps(f)
         def decorated_function(*args, **kwargs):
-            # Controleer of er JSON data is
-            if not request.is_json:
-                logger.warning(f"Verzoek naar {request.path} bevat geen JSON data")
+            # Controleer of er JSON data is, de geparste body wordt door Flask gecached
+            body = request.get_json(silent=True)
+            if body is None:
+                logger.warning("Verzoek naar %s bevat geen JSON data", request.path)
                 return jsonify({"error": "Verzoek moet JSON data bevatten"}), 400
+            g.body = body
             
-            # Haal het schema op
-            schema = SCHEMAS.get(schema_name)
-            if not schema:
-                logger.error(f"Onbekend schema: {schema_name}")
+            # Controleer of het schema bestaat
+            if schema_name not in VALIDATORS:
+                logger.error("Onbekend schema: %s", schema_name)
                 return f(*args, **kwargs)
             
             # Valideer de JSON data
             try:
-                validate(instance=request.json, schema=schema)
+                validate_instance(schema_name, body)
             except ValidationError as e:
-                logger.warning(f"JSON validatie fout: {e}")
+                logger.warning("JSON validatie fout: %s", e.message)
                 return jsonify({
                     "error": "Ongeldige JSON data", 
-                    "details": str(e),
-                    "path": list(e.path) if e.path else None
+                    "details": e.message,
+                    "path": error_path(e)
                 }), 400
                 
             return f(*args, **kwargs)
@@ -90,33 +146,22 @@ def validate_params(schema_name):
     def decorator(f):
         @functools.wraps(f)
         def decorated_function(*args, **kwargs):
-            # Haal het schema op
-            schema = SCHEMAS.get(schema_name)
-            if not schema:
-                logger.error(f"Onbekend schema: {schema_name}")
+            # Haal het model op
+            model = PARAM_MODELS.get(schema_name)
+            if model is None:
+                logger.error("Onbekend schema: %s", schema_name)
                 return f(*args, **kwargs)
             
-            # Converteer query parameters
-            query_params = {}
-            for key, value in request.args.items():
-                # Probeer boolean te converteren
-                if value.lower() in ('true', 'false'):
-                    query_params[key] = (value.lower() == 'true')
-                # Probeer integer te converteren
-                elif value.isdigit():
-                    query_params[key] = int(value)
-                else:
-                    query_params[key] = value
-            
-            # Valideer de parameters
+            # Converteer en valideer de parameters, strings worden omgezet naar bool/int
             try:
-                validate(instance=query_params, schema=schema)
-            except ValidationError as e:
-                logger.warning(f"Parameter validatie fout: {e}")
+                g.params = msgspec.convert(request.args.to_dict(), model, strict=False)
+            except msgspec.ValidationError as e:
+                logger.warning("Parameter validatie fout: %s", e)
+                message, _, location = str(e).partition(" - at `$.")
                 return jsonify({
                     "error": "Ongeldige parameters", 
-                    "details": str(e),
-                    "path": list(e.path) if e.path else None
+                    "details": message,
+                    "path": location.rstrip('`').split('.') if location else None
                 }), 400
                 
             return f(*args, **kwargs)
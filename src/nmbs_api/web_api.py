@@ -13,15 +13,17 @@ This file now serves as a compatibility layer to maintain backward compatibility
 import logging
 from .web import start_web_server
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("nmbs_web_api.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging, unless the entry point (e.g. run_web_api.py) already did.
+# The log file is only opened when the first record is written.
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("nmbs_web_api.log", delay=True),
+            logging.StreamHandler()
+        ]
+    )
 logger = logging.getLogger(__name__)
 
 # Export the main function
@@ -1,16 +1,37 @@
 # Note: This is a hypothetical file as it wasn't provided. 
 # You'll need to adapt this to your actual file structure.
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import sys
 import json
+import tempfile
+import mmap
+import collections
+from array import array
+from itertools import islice
 import logging
+import gzip
+import hashlib
+import threading
+import orjson
 import pandas as pd
 from dotenv import load_dotenv
 
+try:
+    import pyarrow as pa
+except ImportError:  # Optional, ?format=arrow is then not available
+    pa = None
+
+try:
+    import brotli
+except ImportError:  # Optional, cached pages are then only precompressed with gzip
+    brotli = None
+
 # Import the new search functionality
 from api_search import search_data, optimize_data_for_search
 
@@ -19,6 +40,7 @@ from nmbs_api import (
     get_realtime_data, 
     get_planning_files_list,
     get_planning_file, 
+    get_planning_file_rows,
     force_update
 )
 
@@ -26,17 +48,27 @@ from nmbs_api import (
 from src.nmbs_api.web.trajectories_endpoint import get_trajectories
 # Import pagination configuration
 from src.nmbs_api.web.config import get_pagination_settings
+# Import the limit on requests in progress per client
+from src.nmbs_api.web.rate_limits import concurrent_limit
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+# Behind a reverse proxy the client address comes from X-Forwarded-For, so rate
+# limits count per client instead of per proxy. Only trust as many hops as there are proxies.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=1)
+# Use a shared Redis (e.g. redis://localhost:6379/0) so all workers share the same counters
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per minute", "10000 per hour"],
-    storage_uri="memory://",
+    storage_uri=os.getenv('RATELIMIT_STORAGE_URI', 'memory://'),
+    strategy="moving-window",
+    headers_enabled=True,
 )
 
 # Configure logging
@@ -48,32 +80,320 @@ logger = logging.getLogger(__name__)
 
 # Cache for optimized search data
 data_cache = {}
+# Pre-serialized planning pages by (filename, page, page_size)
+cache_bytes = {}
+# Page sizes that are kept in cache_bytes
+CACHED_PAGE_SIZES = (1000, 5000)
+# Compressed forms of the cached pages by the same key: {key: {encoding: bytes}}
+cache_encoded = {}
+# Pages smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+# ETag of the cached pages by the same key, a hash of the page itself
+cache_etags = {}
+# Other pages are cached on their first request as (body, encoded, etag), by the same key.
+# Only the least recently used PAGE_CACHE_SIZE are kept, any file and page can be requested.
+page_cache = collections.OrderedDict()
+PAGE_CACHE_SIZE = 256
+page_cache_lock = threading.Lock()
+# Memory mapped NDJSON of the cached files: {filename: (rows, offsets)}
+ndjson_maps = {}
+# Rows encoded per chunk when NDJSON is streamed from the rows themselves
+NDJSON_CHUNK_ROWS = 500
+# Unique id column of each planning file for cursor pagination
+CURSOR_COLUMNS = {
+    'stops.txt': 'stop_id',
+    'routes.txt': 'route_id',
+    'trips.txt': 'trip_id',
+    'calendar.txt': 'service_id',
+    'agency.txt': 'agency_id'
+}
+# Position of every id by file: {filename: (data, {id: index})}
+cursor_index = {}
+# Only one cache rebuild runs at a time
+cache_rebuild_lock = threading.Lock()
 CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache')
 os.makedirs(CACHE_DIR, exist_ok=True)
 
-def init_cache():
-    """Initialize the cache with frequently used data"""
-    global data_cache
+# Keys are sorted like jsonify does, numpy values from pandas are serialized natively
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS
+
+def _json_response(obj, status=200):
+    """Create a JSON response serialized with orjson"""
+    return app.response_class(orjson.dumps(obj, option=JSON_OPTIONS), status=status, mimetype='application/json')
+
+def _paginated_body(data, page, page_size):
+    """Serialize one page of a planning file with its pagination info"""
+    total = len(data)
+    start_idx = page * page_size
+    end_idx = min(start_idx + page_size, total)
+    
+    return orjson.dumps({
+        "data": data[start_idx:end_idx],
+        "pagination": {
+            "page": page,
+            "pageSize": page_size,
+            "totalRecords": total,
+            "totalPages": (total + page_size - 1) // page_size,
+            "hasNextPage": end_idx < total,
+            "hasPrevPage": page > 0
+        }
+    }, option=JSON_OPTIONS)
+
+def _intern_strings(rows):
+    """
+    Share one string object between rows for columns with few distinct values
+    
+    Columns like agency_id, route_type and service_id repeat the same values
+    across many rows, so interning them shrinks the cached planning data.
+    """
+    if not rows or not isinstance(rows[0], dict):
+        return
+    for column in rows[0].keys():
+        values = {row.get(column) for row in rows}
+        if len(values) * 10 >= len(rows):
+            continue
+        for row in rows:
+            value = row.get(column)
+            if isinstance(value, str):
+                row[column] = sys.intern(value)
+
+def _encode_page(body):
+    """Compress a pre-serialized page once so cached responses cost no CPU per request"""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {}
+    encoded = {'gzip': gzip.compress(body, compresslevel=6, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality=4)
+    return encoded
+
+def _page_etag(body):
+    """
+    ETag of a cached page
+    
+    Hashed from the page itself, so every worker gives the same page the same
+    ETag and clients keep their copy over restarts and unchanged updates.
+    """
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+def _get_recent_page(cache, key):
+    """Get a page cached on an earlier request, or None"""
+    with page_cache_lock:
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+        return entry
+
+def _keep_recent_page(cache, key, entry):
+    """Cache a page for the next requests, dropping the least recently used ones"""
+    with page_cache_lock:
+        cache[key] = entry
+        while len(cache) > PAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def _page_response(body, encoded, etag):
+    """Send a cached page in the best encoding the client accepts"""
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+    
+    encoding = request.accept_encodings.best_match([name for name in ('br', 'gzip') if name in encoded])
+    if encoding:
+        response = app.response_class(encoded[encoding], mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def _cursor_rows(filename):
+    """
+    Get the rows of a planning file and the position of every row id
+    
+    Built once per file and kept until the data is updated, so cursor requests
+    only do a dict lookup and a slice.
+    
+    Returns:
+        tuple: (rows, {id: index}) or None if the file has no rows
+    """
+    cached = cursor_index.get(filename)
+    if cached is None:
+        data = data_cache.get(filename)
+        if data is None:
+            data = get_planning_file_rows(filename)
+        if not data:
+            return None
+        id_col = CURSOR_COLUMNS[filename]
+        # Cursors come from the query string, numeric ids are parsed as numbers
+        cached = (data, {str(row.get(id_col)): i for i, row in enumerate(data)})
+        cursor_index[filename] = cached
+    return cached
+
+def _cursor_bounds(positions, cursor, total, page_size):
+    """
+    Get the row range of the page after a cursor
+    
+    Returns:
+        tuple: (start, end) index of the page, or None if the cursor is unknown
+    """
+    if cursor:
+        position = positions.get(cursor)
+        if position is None:
+            return None
+        start_idx = position + 1
+    else:
+        start_idx = 0
+    return start_idx, min(start_idx + page_size, total)
+
+def _cursor_page(filename, rows, positions, cursor, page_size):
+    """
+    Get the rows after a cursor, without counting or copying the rows before it
+    
+    Returns:
+        dict: The rows and the cursor for the next page, or None if the cursor is unknown
+    """
+    bounds = _cursor_bounds(positions, cursor, len(rows), page_size)
+    if bounds is None:
+        return None
+    start_idx, end_idx = bounds
+    
+    return {
+        "data": rows[start_idx:end_idx],
+        "next_cursor": rows[end_idx - 1].get(CURSOR_COLUMNS[filename]) if end_idx < len(rows) else None
+    }
+
+def _write_ndjson(filename, rows):
+    """
+    Write a planning file as NDJSON with the byte offset of every row
+    
+    The rows go to {filename}.ndjson and the offsets, one more than there are
+    rows, to {filename}.idx in CACHE_DIR. Both files are memory mapped, so
+    NDJSON pages are sliced from the OS page cache that every process on the
+    host shares. The rows themselves stay in data_cache for the JSON pages,
+    search and cursors.
+    
+    Returns:
+        tuple: (rows mmap, offsets memoryview) or None if the file has no rows
+    """
+    if not rows:
+        return None
+    offsets = array('Q', [0])
+    ndjson_path = os.path.join(CACHE_DIR, f"{filename}.ndjson")
+    idx_path = os.path.join(CACHE_DIR, f"{filename}.idx")
+    
+    # Write next to the old files and swap them in, open maps stay valid.
+    # Every writer gets its own temporary files, so workers sharing CACHE_DIR
+    # never write into the same file, and maps its own files before the swap.
+    ndjson_fd, ndjson_tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=f"{filename}.", suffix='.tmp')
+    idx_tmp = None
     try:
-        # Pre-load and optimize common planning data files
-        for filename in ['stops.txt', 'routes.txt', 'calendar.txt']:
-            data = get_planning_file(filename)
-            if isinstance(data, list):
-                optimize_data_for_search(data)
-                data_cache[filename] = data
-        logger.info("Search cache initialized")
-    except Exception as e:
-        logger.error(f"Error initializing cache: {e}")
+        with os.fdopen(ndjson_fd, 'wb') as f:
+            for row in rows:
+                f.write(orjson.dumps(row, option=JSON_OPTIONS | orjson.OPT_APPEND_NEWLINE))
+                offsets.append(f.tell())
+        idx_fd, idx_tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=f"{filename}.", suffix='.tmp')
+        with os.fdopen(idx_fd, 'wb') as f:
+            offsets.tofile(f)
+        
+        with open(ndjson_tmp, 'rb') as f:
+            rows_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(idx_tmp, 'rb') as f:
+            idx_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        os.replace(ndjson_tmp, ndjson_path)
+        os.replace(idx_tmp, idx_path)
+    except Exception:
+        for path in (ndjson_tmp, idx_tmp):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+        raise
+    return rows_map, memoryview(idx_map).cast('Q')
+
+def _ndjson_slice(mapped, start, end):
+    """Get rows start to end of a memory mapped NDJSON file as one bytes object"""
+    rows_map, offsets = mapped
+    total = len(offsets) - 1
+    start, end = min(start, total), min(end, total)
+    return rows_map[offsets[start]:offsets[end]]
+
+def _ndjson_response(rows):
+    """Stream rows as newline delimited JSON, encoded in chunks while they are sent"""
+    option = JSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+    
+    def generate():
+        rows_iter = iter(rows)
+        while True:
+            chunk = b"".join([orjson.dumps(row, option=option) for row in islice(rows_iter, NDJSON_CHUNK_ROWS)])
+            if not chunk:
+                return
+            yield chunk
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+def _arrow_response(rows):
+    """Send rows as a columnar Arrow IPC stream"""
+    table = pa.Table.from_pylist(rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return app.response_class(sink.getvalue().to_pybytes(), mimetype='application/vnd.apache.arrow.stream')
+
+def init_cache():
+    """
+    Initialize the cache with frequently used data
+    
+    The new cache is built next to the current one and swapped in at once,
+    so requests keep using the previous data until the rebuild is done.
+    """
+    global data_cache, cache_bytes, cache_encoded, cache_etags, page_cache, cursor_index, ndjson_maps
+    with cache_rebuild_lock:
+        try:
+            new_data_cache = {}
+            new_cache_bytes = {}
+            new_cache_encoded = {}
+            new_cache_etags = {}
+            new_ndjson_maps = {}
+            
+            # Pre-load and optimize common planning data files
+            for filename in ['stops.txt', 'routes.txt', 'calendar.txt']:
+                data = get_planning_file_rows(filename)
+                if data:
+                    _intern_strings(data)
+                    optimize_data_for_search(data)
+                    new_data_cache[filename] = data
+                    
+                    mapped = _write_ndjson(filename, data)
+                    if mapped is not None:
+                        new_ndjson_maps[filename] = mapped
+                    
+                    # Pre-serialize every page at the common page sizes
+                    for page_size in CACHED_PAGE_SIZES:
+                        for page in range(max(1, (len(data) + page_size - 1) // page_size)):
+                            body = _paginated_body(data, page, page_size)
+                            new_cache_bytes[(filename, page, page_size)] = body
+                            new_cache_encoded[(filename, page, page_size)] = _encode_page(body)
+                            new_cache_etags[(filename, page, page_size)] = _page_etag(body)
+            
+            data_cache, cache_bytes, cache_encoded, cursor_index = new_data_cache, new_cache_bytes, new_cache_encoded, {}
+            cache_etags, page_cache, ndjson_maps = new_cache_etags, collections.OrderedDict(), new_ndjson_maps
+            logger.info("Search cache initialized")
+        except Exception as e:
+            logger.error(f"Error initializing cache: {e}")
+
+def warm_cache():
+    """Rebuild the cache in a background thread"""
+    threading.Thread(target=init_cache, name="cache-warmer", daemon=True).start()
 
 @app.route('/api/health')
 def health_check():
-    return jsonify({
+    return _json_response({
         "status": "healthy",
         "service": "NMBS Train Data API"
     })
 
 @app.route('/api/realtime/data')
 @limiter.limit("60 per minute")
+@concurrent_limit(5)
 def realtime_data():
     try:
         data = get_realtime_data()
@@ -82,106 +402,178 @@ def realtime_data():
         if 'search' in request.args and request.args.get('search'):
             data = search_data(
                 data=data,
-                search_params=request.args.to_dict(),
+                search_params=request.args,
                 data_type='realtime',
-                limit=int(request.args.get('limit', 1000))
+                limit=request.args.get('limit', 1000, type=int)
             )
         
-        return jsonify(data)
+        return _json_response(data)
     except Exception as e:
         logger.error(f"Error in realtime_data: {e}")
-        return jsonify({"error": str(e)}), 500
+        return _json_response({"error": str(e)}, 500)
 
 @app.route('/api/planningdata/<filename>')
 def planning_data(filename):
+    # Remove .txt extension if present
+    if filename.endswith('.txt'):
+        filename = filename[:-4]
+    return _serve_planning(f"{filename}.txt")
+
+def _serve_planning(file_with_ext):
+    """Serve a planning file by its file name with the .txt extension"""
     try:
-        # Remove .txt extension if present
-        if filename.endswith('.txt'):
-            filename = filename[:-4]
+        is_search = 'search' in request.args and request.args.get('search')
+        # ?format=ndjson streams the rows of the page one per line
+        is_ndjson = request.args.get('format') == 'ndjson'
+        # ?format=arrow sends the page as one columnar Arrow table
+        is_arrow = request.args.get('format') == 'arrow'
+        if is_arrow and pa is None:
+            return _json_response({"error": "Arrow format requires pyarrow"}, 400)
         
-        # Add .txt extension for file retrieval
-        file_with_ext = f"{filename}.txt"
+        # Pages cached by this request go to the cache it started with, not to a rebuilt one
+        pages, encoded_pages, page_etags, recent_pages = cache_bytes, cache_encoded, cache_etags, page_cache
         
-        # Get data
-        data = get_planning_file(file_with_ext)
+        if not is_search:
+            # Handle pagination for regular requests
+            # Invalid numbers fall back to the defaults instead of raising
+            page = max(0, request.args.get('page', 0, type=int))
+            page_size = min(5000, max(1, request.args.get('limit', 1000, type=int)))
+            
+            # Cursor pagination: ?cursor=<last id of the previous page>&limit=N
+            if 'cursor' in request.args and file_with_ext in CURSOR_COLUMNS:
+                cursor_rows = _cursor_rows(file_with_ext)
+                mapped = ndjson_maps.get(file_with_ext) if is_ndjson else None
+                if cursor_rows is not None and mapped is not None:
+                    # Slice the page from the memory mapped rows, the cursor only gives its bounds
+                    rows, positions = cursor_rows
+                    bounds = _cursor_bounds(positions, request.args.get('cursor'), len(rows), page_size)
+                    if bounds is None:
+                        return _json_response({"error": "Unknown cursor"}, 400)
+                    response = app.response_class(_ndjson_slice(mapped, *bounds), mimetype='application/x-ndjson')
+                    if bounds[1] < len(rows):
+                        response.headers['X-Next-Cursor'] = str(rows[bounds[1] - 1].get(CURSOR_COLUMNS[file_with_ext]))
+                    return response
+                if cursor_rows is not None:
+                    result = _cursor_page(file_with_ext, *cursor_rows, request.args.get('cursor'), page_size)
+                    if result is None:
+                        return _json_response({"error": "Unknown cursor"}, 400)
+                    if is_ndjson or is_arrow:
+                        response = (_arrow_response if is_arrow else _ndjson_response)(result["data"])
+                        if result["next_cursor"] is not None:
+                            response.headers['X-Next-Cursor'] = str(result["next_cursor"])
+                        return response
+                    return _json_response(result)
+            
+            # Serve pre-serialized pages straight from the cache
+            # NDJSON pages of cached files are sliced from the memory mapped rows
+            mapped = ndjson_maps.get(file_with_ext) if is_ndjson else None
+            if mapped is not None:
+                start_idx = page * page_size
+                response = app.response_class(_ndjson_slice(mapped, start_idx, start_idx + page_size), mimetype='application/x-ndjson')
+                response.headers['X-Total-Count'] = str(len(mapped[1]) - 1)
+                return response
+            
+            key = (file_with_ext, page, page_size)
+            if not is_ndjson and not is_arrow:
+                body = pages.get(key)
+                if body is not None:
+                    return _page_response(body, encoded_pages.get(key, {}), page_etags[key])
+                entry = _get_recent_page(recent_pages, key)
+                if entry is not None:
+                    return _page_response(*entry)
         
-        # If data is not a list or dict, return it as-is
-        if not isinstance(data, (list, dict)):
-            return data
+        # Rows of the cached files are in memory, the others are read from the planning data
+        rows = data_cache.get(file_with_ext)
         
-        # Apply search if requested
-        if 'search' in request.args and request.args.get('search'):
+        # Apply search if requested, over every row of the file
+        if is_search:
+            if rows is None:
+                rows = get_planning_file_rows(file_with_ext)
+            if rows is None:
+                return _json_response({"error": f"Planning file '{file_with_ext}' not found"}, 404)
             data = search_data(
-                data=data,
-                search_params=request.args.to_dict(),
+                data=rows,
+                search_params=request.args,
                 data_type='planning',
-                limit=int(request.args.get('limit', 1000))
+                limit=request.args.get('limit', 1000, type=int)
             )
             
             # Return search results without pagination
-            return jsonify({"data": data})
+            return _json_response({"data": data})
         
-        # Handle pagination for regular requests
-        page = int(request.args.get('page', 0))
-        page_size = min(int(request.args.get('limit', 1000)), 5000)
-        
-        if isinstance(data, list):
-            total = len(data)
+        if rows is not None:
+            total = len(rows)
             start_idx = page * page_size
-            end_idx = min(start_idx + page_size, total)
-            
-            paginated_data = data[start_idx:end_idx]
-            
-            return jsonify({
-                "data": paginated_data,
-                "pagination": {
-                    "page": page,
-                    "pageSize": page_size,
-                    "totalRecords": total,
-                    "totalPages": (total + page_size - 1) // page_size,
-                    "hasNextPage": end_idx < total,
-                    "hasPrevPage": page > 0
-                }
-            })
+            # Rows are read by index while streaming, the page is never copied into a new list
+            page_rows = (rows[i] for i in range(start_idx, min(start_idx + page_size, total)))
         else:
-            return jsonify(data)
+            # Other files are paginated by the parser, which only reads the requested page of large files
+            result = get_planning_file(file_with_ext, page=page, page_size=page_size)
+            if result is None:
+                return _json_response({"error": f"Planning file '{file_with_ext}' not found"}, 404)
+            # If data is not a table, return it as-is
+            if not isinstance(result, dict) or not isinstance(result.get("data"), list):
+                return result
+            total = result.get("pagination", {}).get("totalRecords", len(result["data"]))
+            page_rows = result["data"]
+        
+        # Page based pagination, deprecated in favour of the cursor
+        if is_arrow:
+            response = _arrow_response(list(page_rows))
+            response.headers['X-Total-Count'] = str(total)
+            return response
+        
+        if is_ndjson:
+            response = _ndjson_response(page_rows)
+            response.headers['X-Total-Count'] = str(total)
+            return response
+        
+        body = _paginated_body(rows, page, page_size) if rows is not None else orjson.dumps(result, option=JSON_OPTIONS)
+        
+        # Keep existing pages at the common page sizes for the next request
+        if page_size in CACHED_PAGE_SIZES and 0 <= page * page_size < max(total, 1):
+            entry = (body, _encode_page(body), _page_etag(body))
+            _keep_recent_page(recent_pages, key, entry)
+            return _page_response(*entry)
+        
+        return app.response_class(body, mimetype='application/json')
             
     except Exception as e:
         logger.error(f"Error in planning_data: {e}")
-        return jsonify({"error": str(e)}), 500
+        return _json_response({"error": str(e)}, 500)
 
 # Add specialized endpoints for common data files
 @app.route('/api/planningdata/stops')
 def stops_data():
-    return planning_data('stops')
+    return _serve_planning('stops.txt')
 
 @app.route('/api/planningdata/routes')
 def routes_data():
-    return planning_data('routes')
+    return _serve_planning('routes.txt')
 
 @app.route('/api/planningdata/calendar')
 def calendar_data():
-    return planning_data('calendar')
+    return _serve_planning('calendar.txt')
 
 @app.route('/api/planningdata/trips')
 def trips_data():
-    return planning_data('trips')
+    return _serve_planning('trips.txt')
 
 @app.route('/api/planningdata/stop_times')
 def stop_times_data():
-    return planning_data('stop_times')
+    return _serve_planning('stop_times.txt')
 
 @app.route('/api/planningdata/calendar_dates')
 def calendar_dates_data():
-    return planning_data('calendar_dates')
+    return _serve_planning('calendar_dates.txt')
 
 @app.route('/api/planningdata/agency')
 def agency_data():
-    return planning_data('agency')
+    return _serve_planning('agency.txt')
 
 @app.route('/api/planningdata/translations')
 def translations_data():
-    return planning_data('translations')
+    return _serve_planning('translations.txt')
 
 @app.route('/api/update', methods=['POST'])
 @limiter.limit("10 per hour")
@@ -189,30 +581,29 @@ def update_data():
     try:
         success = force_update()
         if success:
-            # Clear cached data as it's outdated
-            data_cache.clear()
-            # Re-initialize cache with fresh data
-            init_cache()
-            return jsonify({
+            # Rebuild the cache with fresh data, the old cache is served until it is ready
+            warm_cache()
+            return _json_response({
                 "status": "success",
                 "message": "Data updated successfully"
             })
         else:
-            return jsonify({
+            return _json_response({
                 "status": "error",
                 "message": "Failed to update data"
-            }), 500
+            }, 500)
     except Exception as e:
         logger.error(f"Error in update_data: {e}")
-        return jsonify({"error": str(e)}), 500
+        return _json_response({"error": str(e)}, 500)
 
 @app.route('/api/trajectories')
 @limiter.limit("60 per minute")
+@concurrent_limit(5)
 def trajectories_data():
     """Endpoint to get trajectories data (combined train routes with stops and status)"""
     try:
         # Get pagination parameters
-        page = int(request.args.get('page', 0))
+        page = max(0, request.args.get('page', 0, type=int))
         
         # Get pagination settings from config for trajectories endpoint
         pagination_settings = get_pagination_settings('trajectories')
@@ -220,22 +611,22 @@ def trajectories_data():
         max_size = pagination_settings['max_size']
         
         # Apply pagination settings with fallback to config values
-        page_size = min(int(request.args.get('limit', default_size)), max_size)
+        page_size = min(max_size, max(1, request.args.get('limit', default_size, type=int)))
         
         # Get trajectories data directly from cache files (faster than using other API endpoints)
         response = get_trajectories(page=page, page_size=page_size)
         
         # If response is a tuple, it contains an error
         if isinstance(response, tuple):
-            return jsonify(response[0]), response[1]
+            return _json_response(response[0], response[1])
             
-        return jsonify(response)
+        return _json_response(response)
     except Exception as e:
         logger.error(f"Error in trajectories_data endpoint: {e}")
-        return jsonify({"error": str(e)}), 500
+        return _json_response({"error": str(e)}, 500)
 
-# Initialize cache on startup
-init_cache()
+# Initialize cache on startup without blocking the first requests
+warm_cache()
 
 if __name__ == '__main__':
     import argparse
@@ -245,6 +636,16 @@ if __name__ == '__main__':
     parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', 25580)), help='Port to run the API on')
     parser.add_argument('--debug', action='store_true', help='Run in debug mode')
     
+    parser.add_argument('--threads', type=int, default=int(os.getenv('API_THREADS', 8)), help='Number of worker threads')
+    
     args = parser.parse_args()
     
-    app.run(host=args.host, port=args.port, debug=args.debug)
+    if args.debug:
+        # Development server with debugger and reloader
+        app.run(host=args.host, port=args.port, debug=True)
+    else:
+        # Multi-threaded production WSGI server. A single process keeps one copy of
+        # the cached planning pages, start more behind RATELIMIT_STORAGE_URI to scale out.
+        from waitress import serve
+        logger.info(f"Serving with waitress using {args.threads} threads")
+        serve(app, host=args.host, port=args.port, threads=args.threads)